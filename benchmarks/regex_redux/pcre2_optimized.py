@@ -6,29 +6,23 @@
 
 import sys
 import pcre2
-import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 
 
-def init_pool(_data):
-    # Pool initializer
-    global data
-    data = _data
-
-
-def n_matches(patn):
+def n_matches(patn, data):
     # Pool worker
-    # Get number of non-overlapping matches in data global to pool.
-    n = sum(1 for _ in pcre2.finditer(patn, data))
+    # Get number of non-overlapping matches in data. Matching releases the
+    # GIL, so threads are enough to run workers in parallel.
+    n = pcre2.count(patn, data)
     return patn.decode(), n
 
 
-def seq_subs(data, subs, result):
-    # Process worker
-    # Apply sequential substitions to given data and store in multiprocess
-    # manager value.
+def seq_subs(data, subs):
+    # Pool worker
+    # Apply sequential substitions to given data.
     for patn, repl in subs:
         data = pcre2.sub(patn, repl, data)
-    result.value = data
+    return data
 
 
 def main():
@@ -57,20 +51,16 @@ def main():
         (b"\\|[^|][^|]*\\|", b"-"),
     ]
 
-    # Kick off sequential substitutions in the background.
-    result = mp.Manager().Value(bytes, b"")
-    process = mp.Process(target=seq_subs, args=(data, subs, result))
-    process.start()
+    with ThreadPoolExecutor() as pool:
+        # Kick off sequential substitutions in the background.
+        result = pool.submit(seq_subs, data, subs)
 
-    # Run match counts in parallel with substitutions.
-    pool = mp.Pool(initializer=init_pool, initargs=(data,))
-    for patn, n in pool.map(n_matches, patns):
-        print(patn, n)
-    pool.close()
+        # Run match counts in parallel with substitutions.
+        for patn, n in pool.map(n_matches, patns, [data] * len(patns)):
+            print(patn, n)
 
-    # Get results from substitution process.
-    process.join()
-    data = result.value
+        # Get results from substitution worker.
+        data = result.result()
 
     print()
     print(init_len)
@@ -1,9 +1,15 @@
 from . import _cy
 
+import hashlib
+import mmap
+import os
+import tempfile
+from array import array
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import auto, IntEnum, IntFlag
-from itertools import islice
-from functools import lru_cache
-from types import MappingProxyType
+from itertools import compress, islice, repeat
+from threading import Lock
 from sys import maxsize
 
 # The below implementation uses as a base that of Google`s RE2 Python bindings:
@@ -17,6 +23,8 @@ __version__ = "0.7.0"
 __libpcre2_version__ = _cy.__libpcre2_version__
 
 
+# Match contexts are read-only during matching, so a single context without a callout function is
+# safely shared between all patterns and threads
 _EMPTY_MATCH_CONTEXT = _cy.create_match_context()
 
 
@@ -70,34 +78,280 @@ def _typeguard_strings(s):
     raise TypeError(f"Cannot process type {s}")
 
 
+_typeguard_subject = _cy.typeguard_subject
+
+
+def _subject_view(subject):
+    # Prepared subjects are matched through their view of the original object
+    return subject._subject if isinstance(subject, Subject) else subject
+
+
+def _substring(s, start=None, end=None):
+    # Substrings of views are copied out as `bytes`, as with `re`
+    res = s[start:end]
+    return res.tobytes() if isinstance(res, memoryview) else res
+
+
+def _empty(s):
+    return "" if isinstance(s, str) else b""
+
+
+def _map_file(path):
+    # Files are mapped read-only rather than read, so pages are only loaded as they are scanned and
+    # may be dropped again under memory pressure. The mapping outlives the file descriptor, and is
+    # released once no match refers to it
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # Empty files cannot be mapped
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Matches are scanned for front to back, so read ahead aggressively where supported
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+
+# ============================================================================
+#                                                               Pattern Cache
+
+# Patterns compiled by the top-level functions are kept in a least recently used cache, bounded
+# both by the number of patterns held and by their total compiled size (including JIT code)
+_MAXCACHE = 512
+_MAXCACHE_BYTES = 64 * 1024 * 1024
+
+_cache = OrderedDict()  # Maps cache key to the tuple `(pattern, size)`
+_cache_lock = Lock()
+_cache_hits = 0
+_cache_misses = 0
+_cache_bytes = 0
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize", "maxbytes", "currbytes"]
+)
+
+
+def _cache_evict():
+    # Must be called with the cache lock held
+    global _cache_bytes
+    while _cache and (len(_cache) > _MAXCACHE or _cache_bytes > _MAXCACHE_BYTES):
+        _, (_, size) = _cache.popitem(last=False)
+        _cache_bytes -= size
+
+
+def _compile(pattern, flags, jit, callout):
+    global _cache_hits, _cache_misses, _cache_bytes
+
+    # Only immutable string types are cached, everything else is compiled as usual
+    if type(pattern) not in (str, bytes):
+        return compile(pattern, flags, jit=jit, callout=callout)
+    key = (type(pattern), pattern, int(flags), jit, callout)
+    try:
+        hash(key)
+    except TypeError:
+        return compile(pattern, flags, jit=jit, callout=callout)
+
+    with _cache_lock:
+        # Cached patterns JIT compiled since (see `Pattern.jit_compile`) no longer match their key,
+        # and are replaced below
+        entry = _cache.get(key)
+        if entry is not None and entry[0].jit == jit:
+            _cache.move_to_end(key)
+            _cache_hits += 1
+            return entry[0]
+        _cache_misses += 1
+
+    # Compile outside of the lock so other threads are not blocked on (JIT) compilation
+    patn = compile(pattern, flags, jit=jit, callout=callout)
+    size = _cy.pattern_size(patn._pcre2_code)
+
+    with _cache_lock:
+        # Another thread may have compiled the same pattern in the meantime
+        entry = _cache.pop(key, None)
+        if entry is not None:
+            _cache_bytes -= entry[1]
+        if size <= _MAXCACHE_BYTES:
+            _cache[key] = (patn, size)
+            _cache_bytes += size
+            _cache_evict()
+    return patn
+
+
+def purge():
+    """
+    Clear the cache of patterns compiled by the top-level functions and reset its statistics.
+    """
+    global _cache_hits, _cache_misses, _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_hits = 0
+        _cache_misses = 0
+        _cache_bytes = 0
+
+
+def cache_info():
+    """
+    Return statistics on the cache of patterns compiled by the top-level functions as a
+    `CacheInfo` named tuple.
+    """
+    with _cache_lock:
+        return CacheInfo(
+            _cache_hits, _cache_misses, _MAXCACHE, len(_cache), _MAXCACHE_BYTES, _cache_bytes
+        )
+
+
+def set_cache_size(maxsize=None, maxbytes=None):
+    """
+    Set the maximum number of patterns and the maximum total compiled size in bytes held by the
+    cache of the top-level functions. Arguments left as `None` are unchanged, and a `maxsize` of
+    zero disables caching.
+    """
+    global _MAXCACHE, _MAXCACHE_BYTES
+    if maxsize is not None and maxsize < 0:
+        raise ValueError("Cache size must be non-negative")
+    if maxbytes is not None and maxbytes < 0:
+        raise ValueError("Cache byte budget must be non-negative")
+    with _cache_lock:
+        if maxsize is not None:
+            _MAXCACHE = maxsize
+        if maxbytes is not None:
+            _MAXCACHE_BYTES = maxbytes
+        _cache_evict()
+
+
+# ============================================================================
+#                                                              Bytecode Cache
+
+# Compiled bytecode may optionally be persisted to a cache directory, so that later processes only
+# need to decode - and JIT compile - patterns instead of compiling them from source
+_CACHE_DIR = os.environ.get("PCRE2_CACHE_DIR") or None
+_CACHE_MAGIC = b"PCRE2PY\x00"
+
+
+def set_cache_dir(path):
+    """
+    Set the directory used to persist compiled pattern bytecode between processes, or disable the
+    persistent cache if `path` is `None`. Defaults to the `PCRE2_CACHE_DIR` environment variable.
+    """
+    global _CACHE_DIR
+    if path is not None:
+        path = os.fspath(path)
+        os.makedirs(path, exist_ok=True)
+    _CACHE_DIR = path
+
+
+def _cache_path(pattern, options, disabled_options):
+    # Entries are keyed on everything that determines the compiled bytecode, so a library upgrade
+    # or a change in options simply results in a cache miss
+    key = hashlib.sha256()
+    for part in (__version__, __libpcre2_version__, type(pattern).__name__):
+        key.update(part.encode() + b"\x00")
+    key.update(int(options).to_bytes(4, "little") + int(disabled_options).to_bytes(4, "little"))
+    key.update(pattern.encode("UTF-8", "surrogatepass") if isinstance(pattern, str) else pattern)
+    return os.path.join(_CACHE_DIR, f"{key.hexdigest()}.pcre2")
+
+
+def _cache_load(path, pattern):
+    try:
+        with open(path, "rb") as f:
+            contents = f.read()
+    except OSError:
+        return None
+
+    # PCRE2 does not validate serialized bytecode, so anything truncated or otherwise corrupted must
+    # be caught here before decoding
+    header_size = len(_CACHE_MAGIC) + hashlib.sha256().digest_size
+    magic, digest, code_bytes = (
+        contents[: len(_CACHE_MAGIC)],
+        contents[len(_CACHE_MAGIC) : header_size],
+        contents[header_size:],
+    )
+    if magic == _CACHE_MAGIC and digest == hashlib.sha256(code_bytes).digest():
+        try:
+            return _cy.deserialize(code_bytes, pattern)
+        except (LibraryError, ValueError):
+            pass
+
+    # Stale or invalid entries are removed, and are rewritten after recompilation
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return None
+
+
+def _cache_store(path, pcre2_code):
+    code_bytes = _cy.serialize(pcre2_code)
+    contents = _CACHE_MAGIC + hashlib.sha256(code_bytes).digest() + code_bytes
+
+    # Write to a temporary file first so that concurrent readers never see partial entries
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except OSError:
+        pass  # The cache is best effort only
+
+
+def _compile_code(pattern, flags):
+    # Handle ASCII flag, defined as the disabling of the UCP PCRE2 option
+    options = flags & ~RegexFlag.ASCII
+    disabled_options = _cy.CompileOption.UCP if flags & RegexFlag.ASCII else 0
+
+    if _CACHE_DIR is None:
+        return _cy.compile(pattern, options, disabled_options)
+
+    path = _cache_path(pattern, options, disabled_options)
+    pcre2_code = _cache_load(path, pattern)
+    if pcre2_code is None:
+        pcre2_code = _cy.compile(pattern, options, disabled_options)
+        _cache_store(path, pcre2_code)
+    return pcre2_code
+
+
 # ============================================================================
 #                                                          Top-Level Functions
 
 
-def compile(pattern, flags=0, *, jit=True, callout=None):
+def compile(pattern, flags=0, *, jit=True, callout=None, offsets=None):
     """
     Compile a regular expression pattern, returning a Pattern object.
+
+    If `offsets` is "bytes", 'str' subjects are matched as their UTF-8 encoding, so that spans are
+    byte offsets into the encoding and substrings are `bytes`. Substitutions, including the matches
+    passed to replacement functions, are unaffected. By default offsets are "chars", or those of
+    `pattern` if it is already compiled.
     """
     # Avoid recompilation if the pattern is already compiled with no option changes
     if isinstance(pattern, Pattern):
         if not flags == 0:
             raise ValueError("Cannot process flags argument with a compiled pattern")
+        if offsets is None:
+            offsets = pattern.offsets
         if pattern.jit == jit:
-            return pattern
+            if pattern.offsets == offsets:
+                return pattern
+            # Offsets only affect how subjects are matched, so the compiled code is shared
+            return Pattern(
+                pattern._pcre2_code, pattern.pattern, pattern.flags, jit, pattern.callout, offsets
+            )
         # If options differ, extract the underlying string for recompilation
         pattern = pattern.pattern
+    if offsets is None:
+        offsets = "chars"
 
     pattern = _typeguard_strings(pattern)
     flags = RegexFlag(flags)
 
-    # Handle ASCII flag, defined as the disabling of the UCP PCRE2 option
-    options = flags & ~RegexFlag.ASCII
-    disabled_options = _cy.CompileOption.UCP if flags & RegexFlag.ASCII else 0
-
-    pcre2_code = _cy.compile(pattern, options, disabled_options)
+    pcre2_code = _compile_code(pattern, flags)
     if jit:
         _cy.jit_compile(pcre2_code)
-    return Pattern(pcre2_code, pattern, flags, jit, callout)
+    return Pattern(pcre2_code, pattern, flags, jit, callout, offsets)
 
 
 def search(pattern, string, flags=0, *, jit=True, callout=None):
@@ -105,7 +359,7 @@ def search(pattern, string, flags=0, *, jit=True, callout=None):
     Scan through `string` looking for a match to the pattern, returning a Match object, or None if
     no match was found.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).search(string)
+    return _compile(pattern, flags, jit, callout).search(string)
 
 
 def match(pattern, string, flags=0, *, jit=True, callout=None):
@@ -113,21 +367,24 @@ def match(pattern, string, flags=0, *, jit=True, callout=None):
     Match the pattern at the start of `string`, returning a Match object, or None if no match was
     found.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).match(string)
+    return _compile(pattern, flags, jit, callout).match(string)
 
 
 def fullmatch(pattern, string, flags=0, *, jit=True, callout=None):
     """
     Match the pattern to all of `string`, returning a Match object, or None if no match was found.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).fullmatch(string)
+    return _compile(pattern, flags, jit, callout).fullmatch(string)
 
 
-def finditer(pattern, string, flags=0, *, jit=True, callout=None):
+def finditer(pattern, string, flags=0, *, overlapped=False, jit=True, callout=None):
     """
     Return an iterator of Match objects for each non-overlapping match in the string.
+
+    If `overlapped` is true, the search for each match resumes from the character after the start
+    of the previous one, so that matches may overlap.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).finditer(string)
+    return _compile(pattern, flags, jit, callout).finditer(string, overlapped=overlapped)
 
 
 def findall(pattern, string, flags=0, *, jit=True, callout=None):
@@ -137,7 +394,7 @@ def findall(pattern, string, flags=0, *, jit=True, callout=None):
     If one or more capture groups are present, return a list of groups for each match. Empty
     matches are included in the result.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).findall(string)
+    return _compile(pattern, flags, jit, callout).findall(string)
 
 
 def split(pattern, string, maxsplit=0, flags=0, *, jit=True, callout=None):
@@ -149,7 +406,7 @@ def split(pattern, string, maxsplit=0, flags=0, *, jit=True, callout=None):
     `maxsplit` is non-zero, at most `maxsplit` splits occur, and the remainder of `string` is
     returned as the final element of the list.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).split(string, maxsplit)
+    return _compile(pattern, flags, jit, callout).split(string, maxsplit)
 
 
 def subn(pattern, repl, string, count=0, flags=0, *, jit=True, callout=None):
@@ -161,7 +418,7 @@ def subn(pattern, repl, string, count=0, flags=0, *, jit=True, callout=None):
     `repl` can be either a string or a callable. If it is a callable, it's passed the Match object
     and must return a replacement string to be used.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).subn(repl, string, count)
+    return _compile(pattern, flags, jit, callout).subn(repl, string, count)
 
 
 def sub(pattern, repl, string, count=0, flags=0, *, jit=True, callout=None):
@@ -172,58 +429,45 @@ def sub(pattern, repl, string, count=0, flags=0, *, jit=True, callout=None):
     `repl` can be either a string or a callable. If it is a callable, it's passed the Match object
     and must return a replacement string to be used.
     """
-    return compile(pattern, flags, jit=jit, callout=callout).sub(repl, string, count)
+    return _compile(pattern, flags, jit, callout).sub(repl, string, count)
 
 
 # ============================================================================
 #                                                               Pattern Object
 
 
-class Pattern:
-    def __init__(self, pcre2_code, pattern, flags, jit, callout):
-        if not isinstance(pcre2_code, _cy.PCRE2Code):
-            raise ValueError(
-                "PCRE2 code must be of type `_cy.PCRE2Code`. It is not recommended to instantiate "
-                "`Pattern` objects directly. Instead, use `pcre2.compile`."
-            )
-        self._pcre2_code = pcre2_code
-        self.pattern = pattern
-        self.flags = flags
-        self.jit = jit
-        self.callout = callout
+class Pattern(_cy.Pattern):
+    __slots__ = ()
 
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        del state["_pcre2_code"]  # Remove the unpicklable pointer
-        return state
+    def __reduce__(self):
+        # Patterns are pickled with their serialized bytecode so that unpickling only requires
+        # decoding - and optionally JIT compiling - rather than compiling from source
+        code_bytes = _cy.serialize(self._pcre2_code)
+        args = (self.pattern, self.flags, self.jit, self.callout, __libpcre2_version__, code_bytes)
+        if self.offsets != "chars":
+            args += (self.offsets,)
+        return (_unpickle_pattern, args)
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
-        # Note that patterns are recompiled - and optionally JIT compiled - when unpickling
-        self._pcre2_code = _cy.compile(self.pattern, self.flags)
-        if self.jit:
-            _cy.jit_compile(self._pcre2_code)
-
-    @property
-    @lru_cache(1)
-    def groups(self):
-        return _cy.pattern_capture_count(self._pcre2_code)
-
-    @property
-    @lru_cache(1)
-    def groupindex(self):
-        groupindex = _cy.pattern_name_dict(self._pcre2_code)
-        return MappingProxyType(groupindex)
+        # Patterns pickled by earlier versions only carry their source and are recompiled
+        pattern, flags, jit = state["pattern"], state["flags"], state["jit"]
+        pcre2_code = _compile_code(pattern, flags)
+        if jit:
+            _cy.jit_compile(pcre2_code)
+        self.__init__(pcre2_code, pattern, flags, jit, state["callout"])
 
     def jit_compile(self):
         """
         JIT compile the pattern, or nothing if the pattern is already JIT compiled.
         """
         if not self.jit:
-            _cy.jit_compile(self._pcre2_code)
-            self.jit = True
+            # JIT compilation cannot run alongside matches in other threads on the same code, so a
+            # fresh copy is compiled and swapped in instead
+            pcre2_code = _compile_code(self.pattern, self.flags)
+            _cy.jit_compile(pcre2_code)
+            self._set_jit_code(pcre2_code)
 
-    def _get_match_context(self, string):
+    def _get_match_context(self, string, subject):
         # Wrap the callout function so userland only interacts with python object, not Cython
         # extension type
         if self.callout is None:
@@ -231,59 +475,142 @@ class Pattern:
         elif callable(self.callout):
 
             def callout_wrapped(pcre2_callout_block):
-                callout_block = CalloutBlock(pcre2_callout_block, self, string)
+                callout_block = CalloutBlock(pcre2_callout_block, self, string, subject)
                 return self.callout(callout_block)
 
             match_context = _cy.create_match_context(callout_function=callout_wrapped)
             return match_context
         raise ValueError("Callout must either be unspecified or a callable")
 
-    def _match(self, string, pos=0, endpos=maxsize, options=0):
-        string = _typeguard_strings(string)
-        pos = max(0, min(pos, len(string)))
-        endpos = max(0, min(endpos, len(string)))
-        match_context = self._get_match_context(string)
-        match_data, match_byte_offset, match_options = _cy.match(
-            self._pcre2_code, string, endpos, pos, match_context, options
+    def finditer(self, string, pos=0, endpos=maxsize, *, overlapped=False):
+        """
+        Return an iterator of Match objects for each non-overlapping match in the string.
+
+        If `overlapped` is true, the search for each match resumes from the character after the
+        start of the previous one, so that matches may overlap.
+        """
+        return self._finditer(string, self._typeguard_subject(string), pos, endpos, overlapped)
+
+    def _finditer(self, string, subject, pos=0, endpos=maxsize, overlapped=False):
+        pos = max(0, min(pos, len(subject)))
+        endpos = max(0, min(endpos, len(subject)))
+        match_context = self._get_match_context(string, subject)
+        for match_data, match_byte_offset, match_options in _cy.match_generator(
+            self._pcre2_code, subject, endpos, pos, match_context, overlapped
+        ):
+            yield Match(
+                match_data, self, string, subject, pos, endpos, match_byte_offset, match_options
+            )
+
+    def finditer_spans(self, string, pos=0, endpos=maxsize, *, groups=(0,), batch=0):
+        """
+        Return an iterator of `array('q')` blocks holding the spans of `groups` for each
+        non-overlapping match in the string, as `start, end` pairs for each group in turn. Groups
+        that did not contribute to a match have the span `(-1, -1)`.
+
+        If `batch` is non-zero, each block holds at most `batch` matches. Otherwise all matches are
+        returned in a single block.
+        """
+        group_numbers = []
+        for group in groups:
+            if isinstance(group, str):
+                if group not in self.groupindex:
+                    raise IndexError("no such group")
+                group_numbers.append(self.groupindex[group])
+            elif hasattr(group, "__index__") and 0 <= group.__index__() <= self.groups:
+                group_numbers.append(group.__index__())
+            else:
+                raise IndexError("No such group")
+        if batch < 0:
+            raise ValueError("Batch size must be non-negative")
+
+        subject = self._typeguard_subject(string)
+        pos = max(0, min(pos, len(subject)))
+        endpos = max(0, min(endpos, len(subject)))
+        match_context = self._get_match_context(string, subject)
+        return _cy.match_spans(
+            self._pcre2_code, subject, endpos, pos, match_context, tuple(group_numbers), batch
         )
-        if match_data:
-            return Match(match_data, self, string, pos, endpos, match_byte_offset, match_options)
-        return None
 
-    def search(self, string, pos=0, endpos=maxsize):
+    def match_at(self, string, positions, endpos=maxsize):
         """
-        Scan through `string` looking for a match to the pattern, returning a Match object, or None
-        if no match was found.
+        Return an `array('q')` holding, for each offset in the iterable `positions`, the end of the
+        match of the pattern at that offset in `string` as `match` would make, or -1 if there was
+        none. Offsets are clamped to the length of `string`, and those past `endpos` never match.
+
+        All positions are matched in a single call. Offsets are translated from the previous
+        position, so ascending positions are the fastest.
         """
-        return self._match(string, pos, endpos)
+        subject = self._typeguard_subject(string)
+        endpos = max(0, min(endpos, len(subject)))
+        match_context = self._get_match_context(string, subject)
+        return _cy.match_at(self._pcre2_code, subject, endpos, positions, match_context)
+
+    def _match_many(self, subjects, options, match, indices, threads):
+        if threads < 1:
+            raise ValueError("Number of threads must be positive")
+        if self.callout is not None:
+            # Callout functions need the GIL and their own subject, so each subject is matched alone
+            mask = array("B", [match(subject) is not None for subject in subjects])
+        elif threads == 1:
+            mask = _cy.match_many(self._pcre2_code, subjects, options)
+        else:
+            # Each batch of subjects is matched without the GIL, so batches run in parallel
+            subjects = list(subjects)
+            size = max(1, -(-len(subjects) // threads))
+            batches = [subjects[idx : idx + size] for idx in range(0, len(subjects), size)]
+            mask = array("B")
+            with ThreadPoolExecutor(threads) as executor:
+                for batch_mask in executor.map(
+                    _cy.match_many, repeat(self._pcre2_code), batches, repeat(options)
+                ):
+                    mask.extend(batch_mask)
+        if indices:
+            return array("q", compress(range(len(mask)), mask))
+        return mask
 
-    def match(self, string, pos=0, endpos=maxsize):
+    def search_many(self, subjects, *, indices=False, threads=1):
         """
-        Match the pattern at the start of `string`, returning a Match object, or None if no match
-        was found.
+        Return an `array('B')` mask that is 1 for each subject in the iterable `subjects` that the
+        pattern matches anywhere in, as `search` would. If `indices` is true, return an
+        `array('q')` of the indices of those subjects instead.
+
+        Subjects are matched in a single call without the GIL. If `threads` is greater than one,
+        subjects are split into that many batches and matched in parallel.
+        """
+        return self._match_many(subjects, 0, self.search, indices, threads)
+
+    def match_many(self, subjects, *, indices=False, threads=1):
         """
-        return self._match(string, pos, endpos, options=_cy.MatchOption.ANCHORED)
+        Return an `array('B')` mask that is 1 for each subject in the iterable `subjects` that the
+        pattern matches at the start of, as `match` would. See `search_many` for details.
+        """
+        options = _cy.MatchOption.ANCHORED
+        return self._match_many(subjects, options, self.match, indices, threads)
 
-    def fullmatch(self, string, pos=0, endpos=maxsize):
+    def fullmatch_many(self, subjects, *, indices=False, threads=1):
         """
-        Match the pattern to all of `string`, returning a Match object, or None if no match was
-        found.
+        Return an `array('B')` mask that is 1 for each subject in the iterable `subjects` that the
+        pattern matches all of, as `fullmatch` would. See `search_many` for details.
         """
         options = _cy.MatchOption.ANCHORED | _cy.MatchOption.ENDANCHORED
-        return self._match(string, pos, endpos, options=options)
+        return self._match_many(subjects, options, self.fullmatch, indices, threads)
 
-    def finditer(self, string, pos=0, endpos=maxsize):
+    def finditer_file(self, path, pos=0, endpos=maxsize):
         """
-        Return an iterator of Match objects for each non-overlapping match in the string.
+        Return an iterator of Match objects for each non-overlapping match in the file at `path`.
+
+        The file is memory mapped rather than read, and spans are byte offsets into the file.
         """
-        string = _typeguard_strings(string)
-        pos = max(0, min(pos, len(string)))
-        endpos = max(0, min(endpos, len(string)))
-        match_context = self._get_match_context(string)
-        for match_data, match_byte_offset, match_options in _cy.match_generator(
-            self._pcre2_code, string, endpos, pos, match_context
-        ):
-            yield Match(match_data, self, string, pos, endpos, match_byte_offset, match_options)
+        return self.finditer(_map_file(path), pos, endpos)
+
+    def count_file(self, path):
+        """
+        Return the number of non-overlapping matches in the file at `path`.
+
+        The file is memory mapped rather than read, and no Match objects are created.
+        """
+        return self.count(_map_file(path))
 
     def findall(self, string, pos=0, endpos=maxsize):
         """
@@ -292,18 +619,11 @@ class Pattern:
         If one or more capture groups are present, return a list of groups for each match. Empty
         matches are included in the result.
         """
-        string = _typeguard_strings(string)
-        empty = type(string)()
-        items = []
-        for match in self.finditer(string, pos, endpos):
-            if not self.groups:
-                item = match.group()
-            elif self.groups == 1:
-                item = match.groups(default=empty)[0]
-            else:
-                item = match.groups(default=empty)
-            items.append(item)
-        return items
+        subject = self._typeguard_subject(string)
+        pos = max(0, min(pos, len(subject)))
+        endpos = max(0, min(endpos, len(subject)))
+        match_context = self._get_match_context(string, subject)
+        return _cy.match_findall(self._pcre2_code, subject, endpos, pos, match_context)
 
     def split(self, string, maxsplit=0):
         """
@@ -314,24 +634,27 @@ class Pattern:
         `maxsplit` is non-zero, at most `maxsplit` splits occur, and the remainder of `string` is
         returned as the final element of the list.
         """
-        string = _typeguard_strings(string)
+        return list(self.splititer(string, maxsplit))
+
+    def splititer(self, string, maxsplit=0):
+        """
+        Return an iterator over the substrings of `string` split by the occurrences of the pattern,
+        as returned by `split`.
+
+        Substrings are produced as matches are found, so the whole result is never held in memory.
+        """
+        subject = self._typeguard_subject(string)
         if maxsplit < 0:
-            return [string]
-        parts = []
-        start = 0
-        for match in islice(self.finditer(string), maxsplit or None):
-            parts.append(string[start : match.start()])
-            parts.extend(map(match.__getitem__, range(1, self.groups + 1)))
-            start = match.end()
-        parts.append(string[start:])
-        return parts
+            return iter([_substring(_subject_view(subject))])
+        match_context = self._get_match_context(string, subject)
+        return _cy.match_split(self._pcre2_code, subject, match_context, maxsplit)
 
     def _suball(self, template, string):
         template = _typeguard_strings(template)
-        string = _typeguard_strings(string)
+        subject = _typeguard_subject(string)
         options = _cy.SubstituteOption.GLOBAL | _cy.SubstituteOption.UNSET_EMPTY
         byte_offset = 0
-        return _cy.substitute(self._pcre2_code, template, string, byte_offset, options=options)
+        return _cy.substitute(self._pcre2_code, template, subject, byte_offset, options=options)
 
     def subn(self, repl, string, count=0):
         """
@@ -342,37 +665,40 @@ class Pattern:
         `repl` can be either a string or a callable. If it is a callable, it's passed the Match
         object and must return a replacement string to be used.
         """
-        string = _typeguard_strings(string)
+        if isinstance(string, Subject) and string.offsets == "bytes":
+            # Substitutions are made into the original object rather than its encoding
+            string = string.string
+        subject = _subject_view(_typeguard_subject(string))
         if count < 0:
-            return (string, 0)
+            return (_substring(subject), 0)
 
         # Short circuit for global substitute
         if count == 0 and not callable(repl) and not self.callout:
-            return self._suball(repl, string)
+            return self._suball(repl, subject)
 
         parts = []
-        empty = type(string)()
+        empty = _empty(subject)
 
         # Pure python needed to apply callback functions
         if callable(repl):
             start = 0
             numsubs = 0
-            for match in islice(self.finditer(string), count or None):
-                parts.append(string[start : match.start()])
+            for match in islice(self._finditer(string, _typeguard_subject(string)), count or None):
+                parts.append(subject[start : match.start()])
                 parts.append(repl(match))
                 start = match.end()
                 numsubs += 1
-            parts.append(string[start:])
-            empty = type(string)()
+            parts.append(subject[start:])
             return empty.join(parts), numsubs
         else:
-            # Iterate through matches to get index of last match
+            # Scan through matches to get index of last match
             repl = _typeguard_strings(repl)
-            end = 0
-            for match in islice(self.finditer(string), count or None):
-                end = match.end()
-            expanded, numsubs = self._suball(repl, string[:end])
-            parts = [expanded, string[end:]]
+            match_context = self._get_match_context(string, subject)
+            _, end = _cy.match_scan(
+                self._pcre2_code, subject, len(subject), 0, match_context, limit=count
+            )
+            expanded, numsubs = self._suball(repl, subject[:end])
+            parts = [expanded, subject[end:]]
 
         return empty.join(parts), numsubs
 
@@ -387,148 +713,34 @@ class Pattern:
         return self.subn(repl, string, count)[0]
 
 
-# ============================================================================
-#                                                                 Match Object
-
-
-class Match:
-    __slots__ = ("_pcre2_match_data", "re", "string", "pos", "endpos", "_byte_offset", "_options")
-
-    def __init__(self, pcre2_match_data, re, string, pos, endpos, byte_offset, options):
-        if not isinstance(pcre2_match_data, _cy.PCRE2MatchData):
-            raise ValueError(
-                "PCRE2 match data must be of type `_cy.PCRE2MatchData`. It is not recommended to "
-                "instantiate `Match` objects directly. Instead, use `Pattern.match`."
-            )
-        self._pcre2_match_data = pcre2_match_data
-        self.re = re
-        self.string = string
-        self.pos = pos
-        self.endpos = endpos
-        self._byte_offset = byte_offset
-        self._options = options
-
-    def __repr__(self):
-        return (
-            f"<{self.__class__.__module__}.{self.__class__.__qualname__} object; "
-            f"span={self.span()}, match={repr(self.group())}>"
-        )
-
-    def _groupguard(self, group):
-        if isinstance(group, int):
-            if not 0 <= group <= self.re.groups:
-                raise IndexError("No such group")
-            group_number = group
-        elif isinstance(group, str):
-            if group not in self.re.groupindex:
-                raise IndexError("no such group")
-            group_number = self.re.groupindex[group]
-        elif hasattr(group, "__index__"):
-            group_number = int(group.__index__())
-        else:
-            raise IndexError("No such group")
-        return group_number
-
-    def expand(self, template):
-        """
-        Return the string obtained by substitution on the template string `template`.
-        """
-        template = _typeguard_strings(template)
-        options = (
-            self._options | _cy.SubstituteOption.REPLACEMENT_ONLY | _cy.SubstituteOption.UNSET_EMPTY
-        )
-        res, _ = _cy.substitute(
-            self.re._pcre2_code,
-            template,
-            self.string,
-            self._byte_offset,
-            options=options,
-            match_data=self._pcre2_match_data,
-        )
-        return res
-
-    def span(self, group=0):
-        """
-        Return the start and end of `group` as the tuple `(start, end)`.
-
-        If `group` did not contribute to the match, `(-1, -1)` is returned.
-        """
-        group_number = self._groupguard(group)
-        return _cy.match_substring_span_bynumber(self._pcre2_match_data, self.string, group_number)
+def _unpickle_pattern(pattern, flags, jit, callout, libpcre2_version, code_bytes, offsets="chars"):
+    pcre2_code = None
+    if libpcre2_version == __libpcre2_version__:
+        try:
+            pcre2_code = _cy.deserialize(code_bytes, pattern)
+        except (LibraryError, ValueError):
+            pass
 
-    def __getitem__(self, group):
-        group_number = self._groupguard(group)
-        return _cy.match_substring_bynumber(self._pcre2_match_data, self.string, group_number)
+    # Fall back to compiling from source if the bytecode was produced by another library version
+    if pcre2_code is None:
+        pcre2_code = _compile_code(pattern, flags)
+    if jit:
+        _cy.jit_compile(pcre2_code)
+    return Pattern(pcre2_code, pattern, flags, jit, callout, offsets)
 
-    def group(self, *groups):
-        """
-        Returns one or more subgroups of the match.
 
-        If there is a single argument, the result is a single string. If there are multiple
-        arguments, the result is a tuple with one item per argument. Without arguments, the whole
-        match is returned.
-        """
-        if not groups:
-            groups = (0,)
-        items = map(self.__getitem__, groups)
-        return next(items) if len(groups) == 1 else tuple(items)
+# ============================================================================
+#                                                               Subject Object
 
-    def groups(self, default=None):
-        """
-        Return a tuple containing all the subgroups of the match.
-        """
-        items = []
-        for group in range(1, self.re.groups + 1):
-            item = self.__getitem__(group)
-            items.append(default if item is None else item)
-        return tuple(items)
 
-    def groupdict(self, default=None):
-        """
-        Return a dictionary mapping subgroup name to group number for all the named subgroups.
-        """
-        items = []
-        for group, index in self.re.groupindex.items():
-            item = self.__getitem__(index)
-            items.append((group, default) if item is None else (group, item))
-        return dict(items)
+Subject = _cy.Subject
 
-    def start(self, group=0):
-        """
-        Return the start index of the substring matched by `group`.
-        """
-        return self.span(group)[0]
 
-    def end(self, group=0):
-        """
-        Return the end index of the substring matched by `group`.
-        """
-        return self.span(group)[1]
+# ============================================================================
+#                                                                 Match Object
 
-    @property
-    @lru_cache(1)
-    def lastindex(self):
-        max_end = -1
-        max_group = None
-        # We look for the rightmost right parenthesis by keeping the first group that ends at
-        # max_end because that is the leftmost/outermost group when there are nested groups!
-        for group in range(1, self.re.groups + 1):
-            end = self.end(group)
-            if max_end < end:
-                max_end = end
-                max_group = group
-        return max_group
 
-    @property
-    @lru_cache(1)
-    def lastgroup(self):
-        max_group = self.lastindex
-        if not max_group:
-            return None
-        for group, index in self.re.groupindex.items():
-            if max_group == index:
-                return group
-        return None
+Match = _cy.Match
 
 
 # ============================================================================
@@ -536,15 +748,18 @@ class Match:
 
 
 class CalloutBlock:
-    def __init__(self, pcre2_callout_block, re, string):
+    def __init__(self, pcre2_callout_block, re, string, subject):
         if not isinstance(pcre2_callout_block, _cy.PCRE2CalloutBlock):
             raise ValueError(
                 "PCRE2 callout block data must be of type `_cy.PCRE2CalloutBlock`. It is not"
                 "recommended to instantiate `CalloutBlock` objects directly."
             )
+        if isinstance(subject, Subject):
+            string = subject.string
         self._pcre2_callout_block = pcre2_callout_block
         self.re = re
         self.string = string
+        self._subject = _subject_view(subject)  # Matched view of `string`, may share its memory
 
     def __repr__(self):
         return (
@@ -553,7 +768,6 @@ class CalloutBlock:
         )
 
     @property
-    @lru_cache(1)
     def value(self):
         return _cy.callout_block_get_value(self._pcre2_callout_block)
 
@@ -580,13 +794,13 @@ class CalloutBlock:
         """
         group_number = self._groupguard(group)
         return _cy.callout_block_substring_span_bynumber(
-            self._pcre2_callout_block, self.string, group_number
+            self._pcre2_callout_block, self._subject, group_number
         )
 
     def __getitem__(self, group):
         group_number = self._groupguard(group)
         return _cy.callout_block_substring_bynumber(
-            self._pcre2_callout_block, self.string, group_number
+            self._pcre2_callout_block, self._subject, group_number
         )
 
     def group(self, *groups):
@@ -635,26 +849,12 @@ class CalloutBlock:
         return self.span(group)[1]
 
     @property
-    @lru_cache(1)
     def lastindex(self):
-        max_end = -1
-        max_group = None
-        # We look for the rightmost right parenthesis by keeping the first group that ends at
-        # max_end because that is the leftmost/outermost group when there are nested groups!
-        for group in range(1, self.re.groups + 1):
-            end = self.end(group)
-            if max_end < end:
-                max_end = end
-                max_group = group
-        return max_group
+        return _cy.callout_block_lastindex(self._pcre2_callout_block)
 
     @property
-    @lru_cache(1)
     def lastgroup(self):
         max_group = self.lastindex
-        if not max_group:
+        if max_group is None:
             return None
-        for group, index in self.re.groupindex.items():
-            if max_group == index:
-                return group
-        return None
+        return self.re._group_names[max_group]
@@ -1,38 +1,256 @@
 # -*- coding:utf-8 -*-
-# cython: profile=True
+# cython: freethreading_compatible=True
 
+cimport cython
 from cython cimport freelist
 from cython.operator cimport dereference
-from libc.stdint cimport uint8_t, uint32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t
 from libc.stdlib cimport malloc, free
 from libc.string cimport strlen
-from cpython cimport Py_INCREF, Py_DECREF, PyObject
-from cpython.unicode cimport PyUnicode_Check, PyUnicode_AsUTF8AndSize
-from cpython.bytes cimport PyBytes_Check, PyBytes_AsStringAndSize
+from cpython cimport Py_INCREF, Py_DECREF, PyObject, array
+from cpython.object cimport PyTypeObject
+from cpython.unicode cimport (
+    PyUnicode_Check,
+    PyUnicode_CheckExact,
+    PyUnicode_AsUTF8AndSize,
+    PyUnicode_AsUTF8String,
+    PyUnicode_FromKindAndData,
+    PyUnicode_GET_LENGTH,
+    PyUnicode_KIND,
+    PyUnicode_DATA,
+    PyUnicode_READ,
+    PyUnicode_WRITE,
+    PyUnicode_Substring,
+    PyUnicode_DecodeUTF8,
+    PyUnicode_DecodeUTF8Stateful,
+    PyUnicode_1BYTE_KIND,
+    PyUnicode_2BYTE_KIND,
+    PyUnicode_4BYTE_KIND,
+)
+from cpython.bytes cimport (
+    PyBytes_Check,
+    PyBytes_CheckExact,
+    PyBytes_AsStringAndSize,
+    PyBytes_FromStringAndSize,
+)
+from cpython.number cimport PyIndex_Check, PyNumber_Index
+from cpython.tuple cimport PyTuple_New, PyTuple_SET_ITEM
+from cpython.buffer cimport PyBuffer_IsContiguous
+from cpython.pyport cimport PY_SSIZE_T_MAX
+from cpython.memoryview cimport PyMemoryView_Check, PyMemoryView_GET_BUFFER
+
+
+cdef extern from "Python.h":
+    bint PyUnicode_IS_ASCII(object o)
 
 from _libpcre2 cimport *
 
+import array
 from enum import IntFlag, IntEnum
+from types import MappingProxyType
 
 
 __libpcre2_version__ = f"{PCRE2_MAJOR}.{PCRE2_MINOR}"
 
 
+# ============================================================================
+#                                                           Code Unit Dispatch
+
+# Patterns are compiled for UTF-8 (or one byte per character for 'bytes' patterns), while native
+# variants of 'str' patterns match 'str' subjects directly in their internal representation. The
+# kind of a compiled code is the `PyUnicode_KIND` of the subjects it matches natively, or zero
+# otherwise. Latin-1 subjects are matched by 8-bit code without UTF support. Pointers to 16-bit
+# and 32-bit structures are stored as their 8-bit counterparts, and are only ever passed to the
+# functions of the width they were created by.
+
+cdef inline pcre2_code_t * code_compile(
+    int kind, const void *pattern, size_t length, uint32_t options, int *errcode, size_t *errpos
+):
+    if kind == PyUnicode_2BYTE_KIND:
+        return <pcre2_code_t *>pcre2_compile_16(
+            <pcre2_sptr16_t>pattern, length, options, errcode, errpos, NULL
+        )
+    elif kind == PyUnicode_4BYTE_KIND:
+        return <pcre2_code_t *>pcre2_compile_32(
+            <pcre2_sptr32_t>pattern, length, options, errcode, errpos, NULL
+        )
+    return pcre2_compile(<pcre2_sptr_t>pattern, length, options, errcode, errpos, NULL)
+
+
+cdef inline int code_jit_compile(int kind, pcre2_code_t *code) noexcept nogil:
+    if kind == PyUnicode_2BYTE_KIND:
+        return pcre2_jit_compile_16(<pcre2_code_16_t *>code, PCRE2_JIT_COMPLETE)
+    elif kind == PyUnicode_4BYTE_KIND:
+        return pcre2_jit_compile_32(<pcre2_code_32_t *>code, PCRE2_JIT_COMPLETE)
+    return pcre2_jit_compile(code, PCRE2_JIT_COMPLETE)
+
+
+cdef inline void code_free(int kind, pcre2_code_t *code):
+    if kind == PyUnicode_2BYTE_KIND:
+        pcre2_code_free_16(<pcre2_code_16_t *>code)
+    elif kind == PyUnicode_4BYTE_KIND:
+        pcre2_code_free_32(<pcre2_code_32_t *>code)
+    else:
+        pcre2_code_free(code)
+
+
+cdef inline pcre2_match_data_t * match_data_create(int kind, const pcre2_code_t *code):
+    if kind == PyUnicode_2BYTE_KIND:
+        return <pcre2_match_data_t *>pcre2_match_data_create_from_pattern_16(
+            <const pcre2_code_16_t *>code, NULL
+        )
+    elif kind == PyUnicode_4BYTE_KIND:
+        return <pcre2_match_data_t *>pcre2_match_data_create_from_pattern_32(
+            <const pcre2_code_32_t *>code, NULL
+        )
+    return pcre2_match_data_create_from_pattern(code, NULL)
+
+
+cdef inline void match_data_free(int kind, pcre2_match_data_t *match_data):
+    if kind == PyUnicode_2BYTE_KIND:
+        pcre2_match_data_free_16(<pcre2_match_data_16_t *>match_data)
+    elif kind == PyUnicode_4BYTE_KIND:
+        pcre2_match_data_free_32(<pcre2_match_data_32_t *>match_data)
+    else:
+        pcre2_match_data_free(match_data)
+
+
+cdef inline uint32_t match_data_ovector_count(int kind, pcre2_match_data_t *match_data):
+    if kind == PyUnicode_2BYTE_KIND:
+        return pcre2_get_ovector_count_16(<pcre2_match_data_16_t *>match_data)
+    elif kind == PyUnicode_4BYTE_KIND:
+        return pcre2_get_ovector_count_32(<pcre2_match_data_32_t *>match_data)
+    return pcre2_get_ovector_count(match_data)
+
+
+cdef inline size_t * match_data_ovector(int kind, pcre2_match_data_t *match_data):
+    if kind == PyUnicode_2BYTE_KIND:
+        return pcre2_get_ovector_pointer_16(<pcre2_match_data_16_t *>match_data)
+    elif kind == PyUnicode_4BYTE_KIND:
+        return pcre2_get_ovector_pointer_32(<pcre2_match_data_32_t *>match_data)
+    return pcre2_get_ovector_pointer(match_data)
+
+
+cdef inline int code_match(
+    int kind,
+    const pcre2_code_t *code,
+    const void *subject,
+    size_t length,
+    size_t startoffset,
+    uint32_t options,
+    pcre2_match_data_t *match_data,
+    pcre2_match_context_t *mcontext,
+) noexcept nogil:
+    # Match contexts are only used by callouts, which are never matched natively
+    if kind == PyUnicode_2BYTE_KIND:
+        return pcre2_match_16(
+            <const pcre2_code_16_t *>code,
+            <pcre2_sptr16_t>subject, length,
+            startoffset,
+            options,
+            <pcre2_match_data_16_t *>match_data,
+            NULL,
+        )
+    elif kind == PyUnicode_4BYTE_KIND:
+        return pcre2_match_32(
+            <const pcre2_code_32_t *>code,
+            <pcre2_sptr32_t>subject, length,
+            startoffset,
+            options,
+            <pcre2_match_data_32_t *>match_data,
+            NULL,
+        )
+    return pcre2_match(
+        code, <pcre2_sptr_t>subject, length, startoffset, options, match_data, mcontext
+    )
+
+
+cdef inline int code_substitute(
+    int kind,
+    const pcre2_code_t *code,
+    const void *subject,
+    size_t length,
+    size_t startoffset,
+    uint32_t options,
+    pcre2_match_data_t *match_data,
+    const void *replacement,
+    size_t rlength,
+    void *outputbuffer,
+    size_t *outlengthptr,
+) noexcept nogil:
+    if kind == PyUnicode_2BYTE_KIND:
+        return pcre2_substitute_16(
+            <const pcre2_code_16_t *>code,
+            <pcre2_sptr16_t>subject, length,
+            startoffset,
+            options,
+            <pcre2_match_data_16_t *>match_data,
+            NULL,
+            <pcre2_sptr16_t>replacement, rlength,
+            <uint16_t *>outputbuffer, outlengthptr,
+        )
+    elif kind == PyUnicode_4BYTE_KIND:
+        return pcre2_substitute_32(
+            <const pcre2_code_32_t *>code,
+            <pcre2_sptr32_t>subject, length,
+            startoffset,
+            options,
+            <pcre2_match_data_32_t *>match_data,
+            NULL,
+            <pcre2_sptr32_t>replacement, rlength,
+            <uint32_t *>outputbuffer, outlengthptr,
+        )
+    return pcre2_substitute(
+        code,
+        <pcre2_sptr_t>subject, length,
+        startoffset,
+        options,
+        match_data,
+        NULL,
+        <pcre2_sptr_t>replacement, rlength,
+        <uint8_t *>outputbuffer, outlengthptr,
+    )
+
+
 # ============================================================================
 #                                                              Pointer Proxies
 
-# Pointer wrappers to manage lifetime and expose to Python code
+# Number of match data blocks kept for reuse by each compiled pattern
+cdef enum:
+    MATCH_DATA_POOL_SIZE = 4
+
+
+# Pointer wrappers to manage lifetime and expose to Python code. Compiled code is only read once
+# created, and so may be shared between threads.
 cdef class PCRE2Code:
     cdef pcre2_code_t *ptr
     cdef bint _pattern_is_str
+    cdef object _pattern  # Source of the pattern, from which native variants are compiled
+    cdef int _kind  # Kind of 'str' subjects matched natively, or zero (see 'Code Unit Dispatch')
+
+    # Match data blocks (and the heap frames PCRE2 keeps inside of them) are recycled between
+    # matches rather than being allocated and freed for each attempt. Blocks are only ever used by
+    # one thread at a time, with the pool itself guarded by a critical section on the instance for
+    # free-threaded builds (these are free on builds with the GIL, unlike a mutex)
+    cdef pcre2_match_data_t *_match_data_pool[MATCH_DATA_POOL_SIZE]
+    cdef int _match_data_pool_size
+
+    # Native variants of 'str' patterns are compiled on first use, keyed by kind. Compilation is
+    # only attempted once for each kind, with None stored if the variant cannot be used
+    cdef dict _native_codes
+    cdef cython.pymutex _native_lock
 
     @staticmethod
-    cdef PCRE2Code from_ptr(pcre2_code_t *ptr, bint pattern_is_str):
+    cdef PCRE2Code from_ptr(pcre2_code_t *ptr, object pattern, int kind = 0):
         """ Ownership of pointer is taken by the new instance """
         cdef PCRE2Code code
         code = PCRE2Code.__new__(PCRE2Code)
         code.ptr = ptr
-        code._pattern_is_str = pattern_is_str
+        code._pattern_is_str = PyUnicode_Check(pattern)
+        code._pattern = pattern
+        code._kind = kind
+        code._match_data_pool_size = 0
+        code._native_codes = {}
         return code
 
     def __init__(self, *args, **kwargs):
@@ -40,20 +258,85 @@ cdef class PCRE2Code:
         raise TypeError(f"Cannot create 'PCRE2Code' instances")
 
     def __dealloc__(self):
+        while self._match_data_pool_size > 0:
+            self._match_data_pool_size -= 1
+            match_data_free(self._kind, self._match_data_pool[self._match_data_pool_size])
         if self.ptr is not NULL:
-            pcre2_code_free(self.ptr)
-
-
+            code_free(self._kind, self.ptr)
+
+    cdef pcre2_match_data_t * borrow_match_data(self):
+        """ Returns NULL if no block is pooled and the memory could not be obtained """
+        with cython.critical_section(self):
+            if self._match_data_pool_size > 0:
+                self._match_data_pool_size -= 1
+                return self._match_data_pool[self._match_data_pool_size]
+        return match_data_create(self._kind, self.ptr)
+
+    cdef void return_match_data(self, pcre2_match_data_t *ptr):
+        """ Ownership of pointer is taken back by the instance """
+        with cython.critical_section(self):
+            if self._match_data_pool_size < MATCH_DATA_POOL_SIZE:
+                self._match_data_pool[self._match_data_pool_size] = ptr
+                self._match_data_pool_size += 1
+                return
+        match_data_free(self._kind, ptr)
+
+    cdef PCRE2Code native_code(self, object subject, PCRE2MatchContext match_context):
+        """
+        Returns the variant of the pattern that matches the subject in its native representation,
+        or None if the subject is to be matched as UTF-8
+        """
+        cdef int kind
+        cdef object code
+
+        # Callout blocks are always read as UTF-8, and ASCII subjects are UTF-8 already. Encoded
+        # subjects (see `Subject`) are matched as UTF-8 too
+        if not self._pattern_is_str or self._kind != 0 or not PyUnicode_Check(subject):
+            return None
+        if PyUnicode_IS_ASCII(subject):
+            return None
+        if match_context is not None and match_context._callout_function is not None:
+            return None
+
+        # Variants are only ever added, so those already compiled are looked up without the lock
+        kind = PyUnicode_KIND(subject)
+        code = self._native_codes.get(kind, self)  # The instance itself marks a missing variant
+        if code is not self:
+            return code
+        with self._native_lock:
+            if kind not in self._native_codes:
+                self._native_codes[kind] = compile_native(self, kind)
+            return self._native_codes[kind]
+
+
+# Note that Cython disables freelists in free-threaded builds. Blocks are returned to their code
+# when deallocated, so the reference to it must survive the clearing of reference cycles
 @freelist(8)
+@cython.no_gc_clear
 cdef class PCRE2MatchData:
     cdef pcre2_match_data_t *ptr
+    cdef PCRE2Code _code  # Pattern the match data block is returned to
+    cdef size_t *_ovector
+    cdef uint32_t _ovector_count
+    cdef size_t _length  # Subject length the match was made with, in code units
+
+    # Known pair of byte and character indices into 'str' subjects, near to the match, from which
+    # offsets are translated. This avoids scanning from the start of the subject for every lookup
+    cdef size_t _anchor_byte
+    cdef size_t _anchor_char
 
     @staticmethod
-    cdef PCRE2MatchData from_ptr(pcre2_match_data_t *ptr):
+    cdef PCRE2MatchData from_ptr(pcre2_match_data_t *ptr, PCRE2Code code):
         """ Ownership of pointer is always taken by the new instance """
         cdef PCRE2MatchData match_data
         match_data = PCRE2MatchData.__new__(PCRE2MatchData)
         match_data.ptr = ptr
+        match_data._code = code
+        match_data._ovector = match_data_ovector(code._kind, ptr)
+        match_data._ovector_count = match_data_ovector_count(code._kind, ptr)
+        match_data._length = 0
+        match_data._anchor_byte = 0
+        match_data._anchor_char = 0
         return match_data
 
     def __init__(self, *args, **kwargs):
@@ -62,9 +345,10 @@ cdef class PCRE2MatchData:
 
     def __dealloc__(self):
         if self.ptr is not NULL:
-            pcre2_match_data_free(self.ptr)
+            self._code.return_match_data(self.ptr)
 
 
+# Match contexts are not modified by matching, so the same context may be used concurrently
 cdef class PCRE2MatchContext:
     cdef pcre2_match_context_t *ptr
     cdef object _callout_function  # Keep a reference to the wrapped callout function
@@ -138,6 +422,7 @@ cdef (uint8_t *, size_t) as_sptr_and_size(object obj) except *:
         int rc
         char *sptr = NULL
         Py_ssize_t length = 0
+        Py_buffer *view
 
     # Encode unicode strings as UTF-8 buffers
     if PyUnicode_Check(obj):
@@ -146,14 +431,99 @@ cdef (uint8_t *, size_t) as_sptr_and_size(object obj) except *:
     elif PyBytes_Check(obj):
         rc = PyBytes_AsStringAndSize(obj, &sptr, &length)
         assert(rc == 0)
+    # Memory views are read in place. The buffer they export from stays valid for as long as the
+    # view is referenced, and cannot be resized meanwhile
+    elif PyMemoryView_Check(obj):
+        view = PyMemoryView_GET_BUFFER(obj)
+        if not PyBuffer_IsContiguous(view, b'C'):
+            raise ValueError("Only contiguous memory views are supported")
+        sptr = <char *>view.buf
+        length = view.len
     else:
-        raise ValueError("Only objects of type 'str' and 'bytes' are supported")
+        raise ValueError("Only objects of type 'str', 'bytes' and 'memoryview' are supported")
     return <uint8_t *>sptr, length
 
 
+cpdef object typeguard_subject(object obj):
+    """
+    Returns the object to match for a subject. Other objects supporting the buffer protocol (e.g.,
+    'bytearray' or 'mmap') are matched in place through a view of their memory. Views hold the
+    buffer export, and so are kept alive by every match made on them. Prepared subjects (see
+    `Subject`) are returned as is, and are unwrapped by the matching functions
+    """
+    if PyUnicode_CheckExact(obj) or PyBytes_CheckExact(obj) or type(obj) is Subject:
+        return obj
+    elif PyUnicode_Check(obj):
+        return str(obj)
+    elif PyBytes_Check(obj):
+        return bytes(obj)
+    try:
+        return memoryview(obj).cast("B")
+    except TypeError:
+        raise TypeError(f"Cannot process type {obj}") from None
+
+
+cdef (uint8_t *, size_t) as_code_unit_sptr_and_size(PCRE2Code code, object obj) except *:
+    """
+    Views into an object as code units matched by the given code, with the size in code units. For
+    native variants, this is the internal representation of the 'str' object
+    """
+    if code._kind != 0:
+        return <uint8_t *>PyUnicode_DATA(obj), PyUnicode_GET_LENGTH(obj)
+    return as_sptr_and_size(obj)
+
+
+cdef void * copy_code_units(object obj, int kind) except NULL:
+    """
+    Copies a 'str' object into a new buffer of code units of the given kind, which must be able to
+    represent all characters of the object. The buffer must be freed by the caller
+    """
+    cdef:
+        Py_ssize_t idx
+        Py_ssize_t length = PyUnicode_GET_LENGTH(obj)
+        int obj_kind = PyUnicode_KIND(obj)
+        void *obj_data = PyUnicode_DATA(obj)
+        void *units
+
+    # Always allocate at least one unit, as allocations of zero bytes may return NULL
+    units = malloc((length + 1) * kind)
+    if units is NULL:
+        raise MemoryError
+    for idx in range(length):
+        PyUnicode_WRITE(kind, units, idx, PyUnicode_READ(obj_kind, obj_data, idx))
+    return units
+
+
+cdef inline object copy_substring(
+    object obj, uint8_t *sptr, bint translated, size_t start, size_t end
+):
+    """
+    Copies the code units between two offsets out of a view into an object, as an object of the
+    same string type. Offsets into translated 'str' objects are byte offsets into their UTF-8
+    encoding (see `is_translated`)
+    """
+    # Start of a match may be after its end when \K is used in an assertion
+    if end < start:
+        end = start
+    if not PyUnicode_Check(obj):
+        return PyBytes_FromStringAndSize(<char *>sptr + start, end - start)
+    if translated:
+        return PyUnicode_DecodeUTF8(<char *>sptr + start, end - start, NULL)
+    return PyUnicode_Substring(obj, start, end)
+
+
 # ============================================================================
 #                                                             Unicode Indexing
 
+cdef inline bint is_translated(object obj, int kind = 0):
+    """
+    Whether indices into the code units of an object, as matched by code of the given kind, differ
+    from its logical indices. This is only the case for 'str' objects with non-ASCII characters
+    matched as UTF-8, as ASCII is encoded one byte per character
+    """
+    return kind == 0 and PyUnicode_Check(obj) and not PyUnicode_IS_ASCII(obj)
+
+
 cdef size_t idx_byte_to_char(
     uint8_t *sptr, size_t byte_idx, size_t start_byte_idx = 0, size_t start_char_idx = 0
 ):
@@ -161,11 +531,18 @@ cdef size_t idx_byte_to_char(
         size_t cur_byte_idx = start_byte_idx
         size_t cur_char_idx = start_char_idx
 
+    # Translation walks either forwards or backwards from the starting indices, so only the bytes
+    # in between are scanned
     while cur_byte_idx < byte_idx:
         if (sptr[cur_byte_idx] & 0xC0) != 0x80:
             cur_char_idx += 1
         cur_byte_idx += 1
 
+    while cur_byte_idx > byte_idx:
+        cur_byte_idx -= 1
+        if (sptr[cur_byte_idx] & 0xC0) != 0x80:
+            cur_char_idx -= 1
+
     return cur_char_idx
 
 
@@ -191,6 +568,271 @@ cdef size_t idx_char_to_byte(
     return cur_byte_idx
 
 
+cdef inline bint idx_is_char_start(uint8_t *sptr, size_t sptr_size, size_t byte_idx):
+    """ Whether an index into UTF-8 code units is at the start of a character, or at the end """
+    return byte_idx >= sptr_size or (sptr[byte_idx] & 0xC0) != 0x80
+
+
+cdef inline uint32_t scan_utf_options(
+    uint8_t *sptr, size_t sptr_size, size_t byte_idx, bint utf_checked
+):
+    """
+    Options for a match at an index into a subject that an earlier match of the same scan has
+    checked as UTF-8. PCRE2 must still reject indices that split characters (e.g. after '\\C')
+    """
+    if utf_checked and idx_is_char_start(sptr, sptr_size, byte_idx):
+        return PCRE2_NO_UTF_CHECK
+    return 0
+
+
+cdef inline size_t idx_next_char(uint8_t *sptr, size_t sptr_size, size_t byte_idx, bint utf):
+    """
+    Index of the character following the one at an index into code units. Only UTF-8 characters
+    span several code units, in which case their continuation bytes are skipped
+    """
+    byte_idx += 1
+    if utf:
+        while byte_idx < sptr_size and (sptr[byte_idx] & 0xC0) == 0x80:
+            byte_idx += 1
+    return byte_idx
+
+
+cdef size_t subject_idx_char_to_byte(
+    Subject handle, object obj, uint8_t *sptr, size_t sptr_size, size_t char_idx
+) except? 0:
+    """
+    Translates a logical index into a translated object (see `is_translated`) into a byte index,
+    through the index of the subject the object was prepared as, if any. Indices past the end of
+    the object are translated to its end
+    """
+    if char_idx >= <size_t>PyUnicode_GET_LENGTH(obj):
+        return sptr_size
+    if handle is not None:
+        return handle.idx_char_to_byte(sptr, sptr_size, char_idx)
+    return idx_char_to_byte(sptr, sptr_size, char_idx)
+
+
+# ============================================================================
+#                                                               Subject Object
+
+# Number of characters between the byte offsets indexed for prepared 'str' subjects
+cdef enum:
+    SUBJECT_CHECKPOINT_INTERVAL = 256
+
+# Prepared subjects are validated as UTF-8 in blocks of this size (in bytes), so that only a block
+# is ever decoded at once
+cdef enum:
+    SUBJECT_VALIDATION_BLOCK_SIZE = 65536
+
+
+@cython.auto_pickle(False)
+cdef class Subject:
+    """
+    A subject prepared once to be matched by any number of patterns, in place of the object itself.
+
+    The buffer of the object is held for the lifetime of the subject. 'bytes' subjects are
+    validated as UTF-8 at most once, for patterns compiled with UTF support. Other bytes-like
+    subjects (e.g., 'bytearray' or 'mmap') are matched in place and may change between matches, so
+    their status is never cached and PCRE2 checks them on every match. Indices into non-ASCII 'str'
+    subjects matched as UTF-8 are translated from an index of byte offsets at regular character
+    intervals, rather than from the start of the subject.
+
+    With `offsets="bytes"`, 'str' subjects are encoded as UTF-8 and matched as such by 'str'
+    patterns, so that offsets are byte offsets into the encoding and substrings are 'bytes'.
+    """
+    cdef readonly object string
+    cdef readonly object _subject  # Matched view of `string`, which may share its memory
+    cdef readonly object offsets
+    cdef bint _immutable  # Whether the contents of the view can never change
+    cdef bint _is_ascii  # Only known ahead of time for immutable views
+    cdef bint _encoded  # Whether the view is the UTF-8 encoding of a 'str' object
+    cdef Py_ssize_t _length
+    cdef int _utf_valid  # Whether the immutable view is valid UTF-8, or -1 if not yet validated
+    cdef size_t *_checkpoints  # Byte offsets of every SUBJECT_CHECKPOINT_INTERVAL-th character
+
+    def __init__(self, string, offsets="chars"):
+        cdef:
+            uint8_t *sptr
+            size_t size
+            size_t idx
+
+        if offsets not in ("chars", "bytes"):
+            raise ValueError("Offsets must be either 'chars' or 'bytes'")
+        if type(string) is Subject:
+            string = (<Subject>string).string
+
+        # Subjects initialized again start afresh, as any index belongs to the previous object
+        with cython.critical_section(self):
+            free(self._checkpoints)
+            self._checkpoints = NULL
+        self._encoded = False
+        self._utf_valid = -1
+
+        self.string = string
+        self.offsets = offsets
+        self._subject = typeguard_subject(string)
+
+        if offsets == "bytes" and PyUnicode_Check(self._subject):
+            self._init_encoded(PyUnicode_AsUTF8String(self._subject))
+            return
+        self._length = len(self._subject)
+        self._immutable = PyUnicode_CheckExact(self._subject) or PyBytes_CheckExact(self._subject)
+
+        # Status of immutable subjects is found once. ASCII subjects are also valid UTF-8, so need
+        # no further validation
+        if PyUnicode_Check(self._subject):
+            self._is_ascii = PyUnicode_IS_ASCII(self._subject)
+            self._utf_valid = 1
+        elif self._immutable:
+            self._is_ascii = self.find_is_ascii()
+            self._utf_valid = 1 if self._is_ascii else -1
+
+    cdef void _init_encoded(self, bytes encoded):
+        # Encodings of 'str' objects are known to be valid
+        self._immutable = True
+        self._is_ascii = PyUnicode_IS_ASCII(self.string)
+        self._subject = encoded
+        self._encoded = True
+        self._utf_valid = 1
+        self._length = len(encoded)
+
+    def __dealloc__(self):
+        free(self._checkpoints)
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return f"<pcre2.Subject object; length={self._length}>"
+
+    @property
+    def is_ascii(self):
+        """ Whether the subject is ASCII, as found from its current contents if mutable """
+        return self._is_ascii if self._immutable else self.find_is_ascii()
+
+    @property
+    def is_utf8(self):
+        """ Whether the subject is valid UTF-8, which 'str' subjects always are """
+        return self.utf_valid()
+
+    cdef bint find_is_ascii(self) except -1:
+        cdef:
+            uint8_t *sptr
+            size_t size
+            size_t idx
+
+        if PyUnicode_Check(self._subject):
+            return PyUnicode_IS_ASCII(self._subject)
+        sptr, size = as_sptr_and_size(self._subject)
+        for idx in range(size):
+            if sptr[idx] & 0x80:
+                return False
+        return True
+
+    cdef bint utf_valid(self) except -1:
+        cdef:
+            uint8_t *sptr
+            size_t size
+            size_t start = 0
+            Py_ssize_t consumed
+            bint valid
+
+        if self._utf_valid >= 0:
+            return self._utf_valid
+
+        sptr, size = as_sptr_and_size(self._subject)
+        try:
+            # Sequences split between blocks are left to be decoded with the next block
+            while size - start > SUBJECT_VALIDATION_BLOCK_SIZE:
+                PyUnicode_DecodeUTF8Stateful(
+                    <char *>sptr + start, SUBJECT_VALIDATION_BLOCK_SIZE, NULL, &consumed
+                )
+                start += consumed
+            PyUnicode_DecodeUTF8(<char *>sptr + start, size - start, NULL)
+            valid = True
+        except UnicodeDecodeError:
+            valid = False
+
+        # Validation is idempotent, so threads racing to validate simply store the same result
+        if self._immutable:
+            self._utf_valid = valid
+        return valid
+
+    cdef bint skips_utf_check(
+        self, PCRE2Code code, uint8_t *sptr, size_t length, size_t offset
+    ) except -1:
+        """
+        Whether matches of 8-bit code on the bytes-like subject, between an offset and a length,
+        may skip UTF checks. Code without UTF support does not check, mutable subjects may have
+        changed since last checked, and PCRE2 must still reject offsets or lengths that split
+        characters
+        """
+        if not self._immutable or code._kind != 0 or not code_is_utf(code):
+            return False
+        if not (idx_is_char_start(sptr, self._length, offset)
+                and idx_is_char_start(sptr, self._length, length)):
+            return False
+        return self.utf_valid()
+
+    cdef size_t idx_char_to_byte(self, uint8_t *sptr, size_t sptr_size, size_t char_idx) except? 0:
+        """
+        Translates a logical index into the 'str' subject into a byte index into its UTF-8 encoding,
+        starting from the closest indexed character before it
+        """
+        cdef:
+            size_t *checkpoints
+            size_t checkpoint = char_idx // SUBJECT_CHECKPOINT_INTERVAL
+            size_t byte_idx
+            size_t cur_char_idx = 0
+
+        # The index is built on first use, as subjects matched natively never need it
+        with cython.critical_section(self):
+            if self._checkpoints is NULL:
+                checkpoints = <size_t *>malloc(
+                    (self._length // SUBJECT_CHECKPOINT_INTERVAL + 1) * sizeof(size_t)
+                )
+                if checkpoints is NULL:
+                    raise MemoryError
+                for byte_idx in range(sptr_size):
+                    if (sptr[byte_idx] & 0xC0) != 0x80:
+                        if cur_char_idx % SUBJECT_CHECKPOINT_INTERVAL == 0:
+                            checkpoints[cur_char_idx // SUBJECT_CHECKPOINT_INTERVAL] = byte_idx
+                        cur_char_idx += 1
+                if cur_char_idx % SUBJECT_CHECKPOINT_INTERVAL == 0:
+                    checkpoints[cur_char_idx // SUBJECT_CHECKPOINT_INTERVAL] = sptr_size
+                self._checkpoints = checkpoints
+            checkpoints = self._checkpoints
+
+        return idx_char_to_byte(
+            sptr,
+            sptr_size,
+            char_idx,
+            checkpoints[checkpoint],
+            checkpoint * SUBJECT_CHECKPOINT_INTERVAL,
+        )
+
+
+cdef inline Subject as_subject_handle(object obj):
+    """ Returns the object if it is a prepared subject, or None otherwise """
+    if type(obj) is Subject:
+        return <Subject>obj
+    return None
+
+
+cdef Subject encoded_subject(object string, bytes encoded):
+    """ Returns a prepared subject for the existing UTF-8 encoding of a 'str' object """
+    cdef Subject handle = Subject.__new__(Subject)
+    handle.string = string
+    handle.offsets = "bytes"
+    handle._init_encoded(encoded)
+    return handle
+
+
+cdef inline bint subject_is_str(object subject, Subject handle):
+    """ Whether a subject is a 'str' object, or the encoding of one (see `Subject`) """
+    return PyUnicode_Check(subject) or (handle is not None and handle._encoded)
+
+
 # ============================================================================
 #                                                                   Exceptions
 
@@ -296,20 +938,108 @@ def compile(object pattern, uint32_t options = 0, disabled_options = 0):
         # offset values is [0, length] inclusive
         raise PatternError(rc, errpos)
 
-    return PCRE2Code.from_ptr(code, PyUnicode_Check(pattern))
+    return PCRE2Code.from_ptr(code, pattern)
+
+
+cdef PCRE2Code compile_native(PCRE2Code code, int kind):
+    """
+    Compiles the variant of a 'str' pattern that matches subjects of the given kind in their native
+    representation. Returns None if the pattern cannot be expressed in code units of the kind
+    """
+    cdef:
+        pcre2_code_t *native_ptr
+        void *patn_units
+        uint32_t options
+        size_t jit_size
+        int rc
+        size_t errpos
+        PCRE2Code native_code
+
+    # Characters outside of ASCII are only treated as they are in UTF mode if Unicode properties
+    # are used, which is the default unless disabled by the ASCII flag
+    raise_from_rc(pcre2_pattern_info(code.ptr, PCRE2_INFO_ARGOPTIONS, &options))
+    if not options & PCRE2_UCP or PyUnicode_KIND(code._pattern) > kind:
+        return None
+
+    # Each code unit is a single character, so the variant is compiled without UTF support. This
+    # also rejects patterns that enable it through a leading '(*UTF)'
+    options = (options & ~PCRE2_UTF) | PCRE2_NEVER_UTF
+
+    patn_units = copy_code_units(code._pattern, kind)
+    try:
+        native_ptr = code_compile(
+            kind, patn_units, PyUnicode_GET_LENGTH(code._pattern), options, &rc, &errpos
+        )
+    finally:
+        free(patn_units)
+
+    # Compilation fails for escapes of characters that do not fit in the code unit width
+    if native_ptr is NULL:
+        return None
+    native_code = PCRE2Code.from_ptr(native_ptr, code._pattern, kind)
+
+    # JIT size is reported as zero if the pattern has not been JIT compiled
+    raise_from_rc(pcre2_pattern_info(code.ptr, PCRE2_INFO_JITSIZE, &jit_size))
+    if jit_size > 0:
+        jit_compile(native_code)
+    return native_code
 
 
 def jit_compile(PCRE2Code code not None):
-    raise_from_rc(pcre2_jit_compile(code.ptr, PCRE2_JIT_COMPLETE))
+    cdef int rc
+
+    # JIT compilation must not run concurrently with matching on the same code, so only codes not
+    # yet shared between threads should be compiled
+    with nogil:
+        rc = code_jit_compile(code._kind, code.ptr)
+    raise_from_rc(rc)
+
+
+# ============================================================================
+#                                                                Serialization
+
+def serialize(PCRE2Code code not None):
+    cdef:
+        uint8_t *code_bytes
+        size_t code_size
+        int32_t rc
+
+    # Note that JIT compiled code is not included in the serialized byte stream
+    rc = pcre2_serialize_encode(<const pcre2_code_t **>&code.ptr, 1, &code_bytes, &code_size, NULL)
+    raise_from_rc(rc)
+    try:
+        return bytes(code_bytes[:code_size])
+    finally:
+        pcre2_serialize_free(code_bytes)
+
+
+def deserialize(bytes code_bytes not None, object pattern):
+    cdef:
+        pcre2_code_t *code
+        int32_t rc
+
+    # The byte stream header is checked for compatibility (e.g., library version, code unit width
+    # and endianness) by PCRE2, but the content itself is not validated. Callers must only pass
+    # bytes produced by `serialize`
+    if len(code_bytes) == 0:
+        raise ValueError("Cannot deserialize an empty byte stream")
+    rc = pcre2_serialize_decode(&code, 1, <const uint8_t *>code_bytes, NULL)
+    raise_from_rc(rc)
+    return PCRE2Code.from_ptr(code, pattern)
 
 
 # ============================================================================
 #                                                       Information Extraction
 
-def pattern_is_utf(PCRE2Code code not None):
+cdef bint code_is_utf(PCRE2Code code) except -1:
+    """ Only valid for 8-bit code, as native variants of other widths never match UTF-8 """
     cdef uint32_t all_options
     raise_from_rc(pcre2_pattern_info(code.ptr, PCRE2_INFO_ALLOPTIONS, &all_options))
-    return bool(all_options & PCRE2_UTF)
+    return (all_options & PCRE2_UTF) != 0
+
+
+def pattern_is_utf(PCRE2Code code not None):
+    return code_is_utf(code)
 
 
 def pattern_capture_count(PCRE2Code code not None):
@@ -318,6 +1048,15 @@ def pattern_capture_count(PCRE2Code code not None):
     return int(capture_count)
 
 
+def pattern_size(PCRE2Code code not None):
+    cdef size_t size, jit_size
+    raise_from_rc(pcre2_pattern_info(code.ptr, PCRE2_INFO_SIZE, &size))
+
+    # JIT size is reported as zero if the pattern has not been JIT compiled
+    raise_from_rc(pcre2_pattern_info(code.ptr, PCRE2_INFO_JITSIZE, &jit_size))
+    return int(size + jit_size)
+
+
 def pattern_name_dict(PCRE2Code code not None):
     cdef:
         const uint8_t *name_table
@@ -348,64 +1087,6 @@ def pattern_name_dict(PCRE2Code code not None):
     return name_dict
 
 
-def match_substring_span_bynumber(
-    PCRE2MatchData match_data not None, object subject, size_t number
-):
-    cdef:
-        size_t *ovector
-        uint8_t *subj_sptr
-        size_t subj_size
-        int rc
-        size_t start
-        size_t end
-
-    # Get views into object memory
-    subj_sptr, subj_size = as_sptr_and_size(subject)
-
-    # Only perform offset lookup if group has been set
-    rc = pcre2_substring_length_bynumber(match_data.ptr, number, NULL)
-    if rc == 0:
-        ovector = pcre2_get_ovector_pointer(match_data.ptr)
-        start = ovector[2 * number]
-        end = ovector[2 * number + 1]
-
-        if PyUnicode_Check(subject):
-            start = idx_byte_to_char(subj_sptr, start)
-            end = idx_byte_to_char(subj_sptr, end)
-
-        return (start, end)
-
-    return (-1, -1)
-
-
-def match_substring_bynumber(PCRE2MatchData match_data not None, object subject, size_t number):
-    cdef:
-        size_t *ovector
-        uint8_t *subj_sptr
-        size_t subj_size
-        int rc
-        size_t start
-        size_t end
-
-    # Get views into object memory
-    subj_sptr, subj_size = as_sptr_and_size(subject)
-
-    # Only perform offset lookup if group has been set
-    rc = pcre2_substring_length_bynumber(match_data.ptr, number, NULL)
-    if rc == PCRE2_ERROR_UNSET:
-        return None
-    raise_from_rc(rc)
-
-    ovector = pcre2_get_ovector_pointer(match_data.ptr)
-    start = ovector[2 * number]
-    end = ovector[2 * number + 1]
-
-    res_obj = bytes(subj_sptr[start:end])
-    if PyUnicode_Check(subject):
-        res_obj = res_obj.decode("UTF-8")
-    return res_obj
-
-
 def callout_block_substring_span_bynumber(
     PCRE2CalloutBlock callout_block not None, object subject, size_t number
 ):
@@ -413,6 +1094,7 @@ def callout_block_substring_span_bynumber(
         uint8_t *subj_sptr
         size_t subj_size
         size_t start
+        size_t start_byte
         size_t end
 
     # Get views into object memory
@@ -430,9 +1112,10 @@ def callout_block_substring_span_bynumber(
             end = callout_block.ptr[0].offset_vector[2 * number + 1]
 
         if start != PCRE2_UNSET:
-            if PyUnicode_Check(subject):
-                start = idx_byte_to_char(subj_sptr, start)
-                end = idx_byte_to_char(subj_sptr, end)
+            if is_translated(subject):
+                start_byte = start
+                start = idx_byte_to_char(subj_sptr, start_byte)
+                end = idx_byte_to_char(subj_sptr, end, start_byte, start)
             return (start, end)
 
     return (-1, -1)
@@ -462,6 +1145,10 @@ def callout_block_substring_bynumber(
             end = callout_block.ptr[0].offset_vector[2 * number + 1]
 
         if start != PCRE2_UNSET:
+            # Slice ASCII strings directly, as byte indices are character indices
+            if PyUnicode_Check(subject) and not is_translated(subject):
+                return subject[start:end]
+
             res_obj = bytes(subj_sptr[start:end])
             if PyUnicode_Check(subject):
                 res_obj = res_obj.decode("UTF-8")
@@ -469,6 +1156,25 @@ def callout_block_substring_bynumber(
     return None
 
 
+def callout_block_lastindex(PCRE2CalloutBlock callout_block not None):
+    cdef:
+        size_t *offset_vector = callout_block.ptr[0].offset_vector
+        uint32_t number
+        uint32_t max_number = 0
+        size_t max_end = 0
+
+    # We look for the rightmost right parenthesis by keeping the first group that ends at max_end
+    # because that is the leftmost/outermost group when there are nested groups! Groups at or above
+    # the capture top are unset
+    for number in range(1, callout_block.ptr[0].capture_top):
+        if offset_vector[2 * number] == PCRE2_UNSET:
+            continue
+        if max_number == 0 or max_end < offset_vector[2 * number + 1]:
+            max_end = offset_vector[2 * number + 1]
+            max_number = number
+    return max_number if max_number != 0 else None
+
+
 def callout_block_get_value(PCRE2CalloutBlock callout_block not None):
     if callout_block.ptr[0].callout_string is NULL:
         callout_value = <int>callout_block.ptr[0].callout_number
@@ -537,6 +1243,11 @@ def create_match_context(object callout_function=None):
     return PCRE2MatchContext.from_ptr(match_context_ptr, callout_function)
 
 
+# Match contexts are read-only during matching, so a single context without a callout function is
+# safely shared between all patterns and threads
+cdef PCRE2MatchContext EMPTY_MATCH_CONTEXT = create_match_context()
+
+
 # ============================================================================
 #                                                                     Matching
 
@@ -544,153 +1255,842 @@ class MatchOption(IntFlag):
     ANCHORED = PCRE2_ANCHORED
     ENDANCHORED = PCRE2_ENDANCHORED
 
-cdef pcre2_match_data_t * _pcre2_match_data_create_from_pattern(
-    const pcre2_code_t *code, pcre2_general_context_t *gcontext
-):
-    return pcre2_match_data_create_from_pattern(code, gcontext)
+# Matches on subjects shorter than this (in bytes) hold on to the GIL, as releasing and reacquiring
+# it would cost more than the match itself
+cdef enum:
+    NOGIL_MIN_LENGTH = 1024
 
 cdef int _pcre2_match(
-    const pcre2_code_t *code,
-    pcre2_sptr_t subject,
+    PCRE2Code code,
+    const uint8_t *subject,
     size_t length,
     size_t startoffset,
     uint32_t options,
     pcre2_match_data_t *match_data,
-    pcre2_match_context_t *mcontext
+    PCRE2MatchContext match_context,
 ):
-    return pcre2_match(code, subject, length, startoffset, options, match_data, mcontext)
+    cdef int rc
+
+    # Python callout functions must run with the GIL held. Otherwise the subject is kept alive by
+    # the caller, and its buffer cannot be reallocated while viewed, so the GIL can be released
+    if match_context._callout_function is not None or length - startoffset < NOGIL_MIN_LENGTH:
+        return code_match(
+            code._kind,
+            code.ptr,
+            subject, length,
+            startoffset,
+            options,
+            match_data,
+            match_context.ptr,
+        )
+    with nogil:
+        rc = code_match(
+            code._kind,
+            code.ptr,
+            subject, length,
+            startoffset,
+            options,
+            match_data,
+            match_context.ptr,
+        )
+    return rc
 
 cdef PCRE2MatchData _match(
     PCRE2Code code,
     uint8_t *subj_sptr,
-    size_t byte_length,
-    size_t byte_offset,
+    size_t length, # length & offset in code units
+    size_t offset,
     uint32_t options,
     PCRE2MatchContext match_context,
 ) except *:
     cdef:
         pcre2_match_data_t *match_data_ptr
+        PCRE2MatchData match_data
         int rc
 
-    # Allocate memory for match data, returning NULL if the memory could not be obtained
-    match_data_ptr = _pcre2_match_data_create_from_pattern(code.ptr, NULL)
+    # Borrow match data from the pattern, returning NULL if the memory could not be obtained
+    match_data_ptr = code.borrow_match_data()
     if match_data_ptr is NULL:
         raise MemoryError
 
     # Attempt match of pattern onto the subject
-    rc = _pcre2_match(
-        code.ptr, subj_sptr, byte_length, byte_offset, options, match_data_ptr, match_context.ptr
-    )
-    if rc == PCRE2_ERROR_NOMATCH:
-        return None
-    raise_from_rc(rc)
+    rc = _pcre2_match(code, subj_sptr, length, offset, options, match_data_ptr, match_context)
+    if rc < 0:
+        code.return_match_data(match_data_ptr)
+        if rc == PCRE2_ERROR_NOMATCH:
+            return None
+        raise_from_rc(rc)
 
-    return PCRE2MatchData.from_ptr(match_data_ptr)
+    match_data = PCRE2MatchData.from_ptr(match_data_ptr, code)
+    match_data._length = length
+    return match_data
 
-def match(
-    PCRE2Code code not None,
-    object subject,
-    size_t length, # length & offset in logical (index) units
-    size_t offset,
-    PCRE2MatchContext match_context not None,
-    uint32_t options = 0,
-):
-    cdef:
-        uint8_t *subj_sptr
-        size_t subj_size
 
+cdef int check_subject_type(PCRE2Code code, object subject, Subject handle) except -1:
+    """ Raises if a pattern cannot be used on a subject, as one is 'str' and the other is not """
     # Although the error message says "cannot use..." there would actually be nothing wrong at all
     # with removing this block and allowing it. It's simply a matter of policy and clarity, and to
     # match Python's re module.
-    if code._pattern_is_str ^ PyUnicode_Check(subject):
+    if code._pattern_is_str ^ subject_is_str(subject, handle):
         if code._pattern_is_str:
             raise TypeError("Cannot use a string pattern on a bytes-like object")
         else:
             raise TypeError("Cannot use a bytes pattern on a string-like object")
+    return 0
 
-    # Get views into object memory
-    subj_sptr, subj_size = as_sptr_and_size(subject)
-
-    if PyUnicode_Check(subject):
-        # Disable UTF-8 encoding checks for improved performance
-        options |= PCRE2_NO_UTF_CHECK
 
-        length = (
-            subj_size if length == len(subject) else idx_char_to_byte(subj_sptr, subj_size, length)
+@freelist(8)
+@cython.final
+cdef class SubjectScan:
+    """
+    A subject prepared to be matched by a pattern, either once or repeatedly by a scan for all of
+    its matches. Holds the view of the subject in the code units of the code matching it, with the
+    offsets and options of the next match (see `prepare_subject`)
+    """
+    cdef object subject  # Object matched, unwrapped from any prepared subject
+    cdef Subject handle
+    cdef PCRE2Code code  # Code matching the subject, which may be a native variant
+    cdef uint8_t *sptr
+    cdef size_t size
+    cdef size_t byte_length
+    cdef size_t byte_offset  # Offset from which the next match is attempted
+    cdef uint32_t options  # Options of every match
+    cdef uint32_t state_options  # Options of the next match of the scan only
+    cdef uint32_t match_options  # Options the last match was attempted with
+    cdef bint translated  # Whether logical indices differ from offsets (see `is_translated`)
+    cdef bint utf_checked  # Whether matches at character starts may skip UTF checks
+    cdef bint utf_scan  # Whether the first match of the immutable subject checks the rest of it
+    cdef bint utf  # Whether overlapping matches resume from the next UTF-8 character
+    cdef bint overlapped
+
+    cdef int begin_scan(self, bint overlapped) except -1:
+        """ Prepares for a scan of matches, rather than a single match """
+        self.overlapped = overlapped
+        if self.code._kind == 0 and code_is_utf(self.code):
+            # The first match checks all of the subject that later matches of the scan may inspect.
+            # Other bytes-like subjects (e.g., 'bytearray') may change between matches, so every
+            # match checks them again
+            self.utf_scan = PyBytes_CheckExact(self.subject)
+            self.utf = overlapped
+        return 0
+
+    cdef uint32_t next_options(self):
+        """ Options of the next match, which skips UTF checks of subjects known to be valid """
+        return (
+            self.options
+            | self.state_options
+            | scan_utf_options(self.sptr, self.size, self.byte_offset, self.utf_checked)
         )
-        offset = (
-            subj_size if offset == len(subject) else idx_char_to_byte(subj_sptr, subj_size, offset)
+
+    cdef bint find(
+        self, pcre2_match_data_t *match_data_ptr, PCRE2MatchContext match_context
+    ) except -1:
+        """ Attempts the next match of the scan, returning whether one was found """
+        cdef int rc
+
+        if self.byte_offset > self.byte_length:
+            return False
+        self.match_options = self.next_options()
+        rc = _pcre2_match(
+            self.code,
+            self.sptr,
+            self.byte_length,
+            self.byte_offset,
+            self.match_options,
+            match_data_ptr,
+            match_context,
         )
+        self.utf_checked = self.utf_checked or self.utf_scan
+        if rc == PCRE2_ERROR_NOMATCH:
+            return False
+        raise_from_rc(rc)
+        return True
 
-    return _match(code, subj_sptr, length, offset, options, match_context), offset, options
+    cdef bint advance(self, size_t *ovector):
+        """ Moves the scan past the match found, returning whether later matches may be found """
+        if self.overlapped:
+            # Resume from the character after the start of the match, so that the next match may
+            # overlap this one
+            self.byte_offset = idx_next_char(self.sptr, self.byte_length, ovector[0], self.utf)
+            return True
 
+        # If the matched string is empty ensure the next match makes progress
+        self.state_options = PCRE2_NOTEMPTY_ATSTART if ovector[0] == ovector[1] else 0
+        self.byte_offset = ovector[1]
 
-def match_generator(
-    PCRE2Code code not None,
+        # No need to re-match after an empty match at the end (it will just find nothing)
+        return not (ovector[0] == ovector[1] and ovector[1] >= self.byte_length)
+
+
+cdef SubjectScan prepare_subject(
+    PCRE2Code code,
     object subject,
     size_t length, # length & offset in logical (index) units
     size_t offset,
-    PCRE2MatchContext match_context not None,
+    PCRE2MatchContext match_context,
 ):
+    """
+    Prepares a subject to be matched by a pattern from an offset, up to a length. Lengths past the
+    end of the subject are clamped to it
+    """
     cdef:
-        uint32_t starting_options = 0
-        uint32_t state_options = 0
-        uint32_t match_options
-        size_t byte_length = length
-        size_t byte_offset = offset
-        size_t match_byte_offset
-
-    # Although the error message says "cannot use..." there would actually be nothing wrong at all
-    # with removing this block and allowing it. It's simply a matter of policy and clarity, and to
-    # match Python's re module.
-    if code._pattern_is_str ^ PyUnicode_Check(subject):
-        if code._pattern_is_str:
-            raise TypeError("Cannot use a string pattern on a bytes-like object")
-        else:
-            raise TypeError("Cannot use a bytes pattern on a string-like object")
+        SubjectScan state = SubjectScan.__new__(SubjectScan)
+        PCRE2Code native_code
+
+    # Prepared subjects are matched through their view of the object
+    state.handle = as_subject_handle(subject)
+    if state.handle is not None:
+        subject = state.handle._subject
+    check_subject_type(code, subject, state.handle)
+
+    # Match 'str' subjects in their native representation where possible
+    native_code = code.native_code(subject, match_context)
+    if native_code is not None:
+        code = native_code
+    state.subject = subject
+    state.code = code
 
     # Get views into object memory
-    subj_sptr, subj_size = as_sptr_and_size(subject)
+    state.sptr, state.size = as_code_unit_sptr_and_size(code, subject)
 
-    if PyUnicode_Check(subject):
-        # Disable UTF-8 encoding checks for improved performance
-        starting_options |= PCRE2_NO_UTF_CHECK
-
-        byte_length = (
-            subj_size if length == len(subject) else idx_char_to_byte(subj_sptr, subj_size, length)
+    # Logical indices of ASCII and natively matched strings are used as is
+    state.translated = is_translated(subject, code._kind)
+    if state.translated:
+        state.byte_length = subject_idx_char_to_byte(
+            state.handle, subject, state.sptr, state.size, length
         )
-        byte_offset = (
-            subj_size if offset == len(subject) else idx_char_to_byte(subj_sptr, subj_size, offset)
+        state.byte_offset = subject_idx_char_to_byte(
+            state.handle, subject, state.sptr, state.size, offset
         )
+    else:
+        state.byte_length = min(length, state.size)
+        state.byte_offset = offset
 
-    while byte_offset <= byte_length:
-        match_options = starting_options | state_options
-        match_byte_offset = byte_offset
-        match_data = _match(
-            code, subj_sptr, byte_length, match_byte_offset, match_options, match_context
+    if PyUnicode_Check(subject):
+        # Disable UTF-8 encoding checks for improved performance
+        state.options = PCRE2_NO_UTF_CHECK
+    elif state.handle is not None:
+        # Prepared subjects are validated once, rather than by every match
+        state.utf_checked = state.handle.skips_utf_check(
+            code, state.sptr, state.byte_length, state.byte_offset
         )
-        if not match_data:
-            break
-
-        else:
-            ovector = pcre2_get_ovector_pointer(match_data.ptr)
-
-            assert(match_byte_offset <= ovector[0] and ovector[0] <= ovector[1])
-            assert(ovector[1] > match_byte_offset or state_options == 0)
-
-            if ovector[0] == ovector[1]:
-                # If the matched string is empty ensure the next match makes progress
-                state_options = PCRE2_NOTEMPTY_ATSTART
-            else:
-                state_options = 0  # Reset options so empty strings can match at next offset
+    return state
 
-            byte_offset = ovector[1]
 
-            yield match_data, match_byte_offset, match_options
+cdef PCRE2MatchData match(
+    PCRE2Code code,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context,
+    uint32_t *options,  # Set to the options the match was made with
+    size_t *byte_offset,  # Set to the offset the match was made from, in code units
+):
+    cdef:
+        SubjectScan state
+        PCRE2MatchData match_data
+
+    state = prepare_subject(code, subject, length, offset, match_context)
+    options[0] |= state.next_options()
+    byte_offset[0] = state.byte_offset
+    match_data = _match(
+        state.code, state.sptr, state.byte_length, state.byte_offset, options[0], match_context
+    )
+    if match_data is not None:
+        match_data._anchor_byte = state.byte_offset
+        match_data._anchor_char = offset
+    return match_data
+
+
+def match_generator(
+    PCRE2Code code not None,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context not None,
+    bint overlapped = False,
+):
+    """
+    Yields match data for each non-overlapping match, or if `overlapped` is true for each match
+    starting at every character of the subject
+    """
+    cdef:
+        size_t char_offset = offset
+        size_t match_byte_offset
+        size_t match_char_offset = offset
+        size_t *ovector
+        pcre2_match_data_t *match_data_ptr
+        bint more
+        SubjectScan state
+        PCRE2MatchData match_data
+
+    state = prepare_subject(code, subject, length, offset, match_context)
+    state.begin_scan(overlapped)
+
+    while True:
+        # Every match is yielded with a block of its own, which is returned when no match is found
+        match_data_ptr = state.code.borrow_match_data()
+        if match_data_ptr is NULL:
+            raise MemoryError
+        match_data = PCRE2MatchData.from_ptr(match_data_ptr, state.code)
+        match_byte_offset = state.byte_offset
+        if not state.find(match_data_ptr, match_context):
+            break
+        match_data._length = state.byte_length
+        ovector = match_data._ovector
+
+        assert(match_byte_offset <= ovector[0] and ovector[0] <= ovector[1])
+        assert(ovector[1] > match_byte_offset or state.state_options == 0)
+
+        # Carry character indices forward from the previous match, so that each translation only
+        # scans the newly matched bytes
+        if state.translated:
+            match_char_offset = idx_byte_to_char(
+                state.sptr, ovector[0], match_byte_offset, char_offset
+            )
+            match_data._anchor_byte = ovector[0]
+            match_data._anchor_char = match_char_offset
+            if not overlapped:
+                char_offset = idx_byte_to_char(
+                    state.sptr, ovector[1], ovector[0], match_char_offset
+                )
+        if overlapped:
+            char_offset = match_char_offset + 1
+
+        more = state.advance(ovector)
+        yield match_data, match_byte_offset, state.match_options
+        if not more:
+            break
+
+
+# Blocks of spans are created by cloning an empty array of signed 64-bit integers
+cdef array.array SPANS_TEMPLATE = array.array("q")
+
+
+def match_spans(
+    PCRE2Code code not None,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context not None,
+    tuple groups,
+    size_t batch = 0,
+):
+    """
+    Scan for non-overlapping matches as in `match_generator`, yielding the logical spans of the
+    given groups rather than match objects. Spans are yielded in blocks of signed 64-bit integers,
+    holding the start and end of each group in turn for every match, with `(-1, -1)` for groups
+    that did not participate. Blocks hold at most `batch` matches if non-zero, and otherwise all
+    matches are yielded in a single block. Nothing is allocated per match
+    """
+    cdef:
+        size_t char_offset = offset
+        size_t match_char_offset
+        size_t start
+        size_t end
+        size_t *ovector
+        uint32_t ovector_count
+        pcre2_match_data_t *match_data_ptr
+        uint8_t *subj_sptr
+        bint translated
+        bint done
+        Py_ssize_t idx
+        uint32_t number
+        Py_ssize_t group_count = len(groups)
+        Py_ssize_t width = 2 * group_count  # Number of integers per match
+        Py_ssize_t capacity = width * (batch if batch != 0 else 64)
+        Py_ssize_t block_size = 0
+        array.array numbers = array.array("I", groups)
+        array.array block
+        long long *spans
+        SubjectScan state
+
+    state = prepare_subject(code, subject, length, offset, match_context)
+    if group_count == 0:
+        raise ValueError("At least one group must be given")
+    state.begin_scan(False)
+    subj_sptr = state.sptr
+    translated = state.translated
+
+    # A single match data block is borrowed from the pattern for the entire scan
+    match_data_ptr = state.code.borrow_match_data()
+    if match_data_ptr is NULL:
+        raise MemoryError
+    ovector = match_data_ovector(state.code._kind, match_data_ptr)
+    ovector_count = match_data_ovector_count(state.code._kind, match_data_ptr)
+
+    try:
+        block = array.clone(SPANS_TEMPLATE, capacity, False)
+        while state.find(match_data_ptr, match_context):
+            # Unbatched blocks grow as needed, while batched blocks are yielded once full
+            if block_size == capacity:
+                capacity *= 2
+                array.resize(block, capacity)
+
+            # Translate group offsets relative to the start of the match, which is carried forward
+            # from the previous match so that only the newly matched bytes are scanned
+            if translated:
+                match_char_offset = idx_byte_to_char(
+                    subj_sptr, ovector[0], state.byte_offset, char_offset
+                )
+
+            spans = block.data.as_longlongs + block_size
+            for idx in range(group_count):
+                number = numbers.data.as_uints[idx]
+                if number >= ovector_count or ovector[2 * number] == PCRE2_UNSET:
+                    spans[2 * idx] = spans[2 * idx + 1] = -1
+                    continue
+                start = ovector[2 * number]
+                end = ovector[2 * number + 1]
+                if translated:
+                    start = idx_byte_to_char(subj_sptr, start, ovector[0], match_char_offset)
+                    end = idx_byte_to_char(subj_sptr, end, ovector[0], match_char_offset)
+                spans[2 * idx] = start
+                spans[2 * idx + 1] = end
+            block_size += width
+
+            if translated:
+                char_offset = idx_byte_to_char(subj_sptr, ovector[1], ovector[0], match_char_offset)
+            done = not state.advance(ovector)
+
+            if batch != 0 and block_size == capacity:
+                yield block
+                block = array.clone(SPANS_TEMPLATE, capacity, False)
+                block_size = 0
+            if done:
+                break
+
+        if block_size != 0:
+            array.resize(block, block_size)
+            yield block
+    finally:
+        state.code.return_match_data(match_data_ptr)
+
+
+def match_findall(
+    PCRE2Code code not None,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context not None,
+):
+    """
+    Scan for non-overlapping matches as in `match_generator`, returning the list of matched
+    substrings as `re.findall` does. Items are the whole match for patterns without groups, the
+    only group for patterns with one, and otherwise tuples of all groups, with unset groups empty
+    """
+    cdef:
+        size_t *ovector
+        uint32_t capture_count
+        uint32_t number
+        pcre2_match_data_t *match_data_ptr
+        uint8_t *subj_sptr
+        bint translated
+        list items = []
+        tuple item
+        object empty
+        object group
+        SubjectScan state
+
+    state = prepare_subject(code, subject, length, offset, match_context)
+    state.begin_scan(False)
+
+    # Substrings of translated strings are decoded from the matched bytes, so no offsets need to be
+    # translated back
+    subject = state.subject
+    subj_sptr = state.sptr
+    translated = state.translated
+    empty = "" if PyUnicode_Check(subject) else b""
+
+    # A single match data block is borrowed from the pattern for the entire scan
+    match_data_ptr = state.code.borrow_match_data()
+    if match_data_ptr is NULL:
+        raise MemoryError
+    ovector = match_data_ovector(state.code._kind, match_data_ptr)
+    capture_count = match_data_ovector_count(state.code._kind, match_data_ptr) - 1
 
-            # No need to re-match after an empty match at the end (it will just find nothing)
-            if ovector[0] == ovector[1] and ovector[1] >= byte_length:
+    try:
+        while state.find(match_data_ptr, match_context):
+            if capture_count <= 1:
+                if ovector[2 * capture_count] == PCRE2_UNSET:
+                    items.append(empty)
+                else:
+                    items.append(copy_substring(
+                        subject,
+                        subj_sptr,
+                        translated,
+                        ovector[2 * capture_count],
+                        ovector[2 * capture_count + 1],
+                    ))
+            else:
+                item = PyTuple_New(capture_count)
+                for number in range(1, capture_count + 1):
+                    if ovector[2 * number] == PCRE2_UNSET:
+                        group = empty
+                    else:
+                        group = copy_substring(
+                            subject,
+                            subj_sptr,
+                            translated,
+                            ovector[2 * number],
+                            ovector[2 * number + 1],
+                        )
+                    Py_INCREF(group)
+                    PyTuple_SET_ITEM(item, number - 1, group)
+                items.append(item)
+
+            if not state.advance(ovector):
                 break
+    finally:
+        state.code.return_match_data(match_data_ptr)
+
+    return items
+
+
+def match_split(
+    PCRE2Code code not None,
+    object subject,
+    PCRE2MatchContext match_context not None,
+    size_t maxsplit = 0,
+):
+    """
+    Split the subject by non-overlapping matches as `re.split` does, yielding the pieces between
+    matches and the groups of each match (None if unset) as they are found. At most `maxsplit`
+    splits are made if non-zero, with the remainder of the subject yielded last
+    """
+    cdef:
+        size_t piece_offset = 0
+        size_t count = 0
+        size_t *ovector
+        uint32_t capture_count
+        uint32_t number
+        pcre2_match_data_t *match_data_ptr
+        uint8_t *subj_sptr
+        bint translated
+        SubjectScan state
+
+    # The whole subject is always split, and pieces of translated strings are decoded from the
+    # matched bytes, so no offsets need to be translated back
+    state = prepare_subject(code, subject, PY_SSIZE_T_MAX, 0, match_context)
+    state.begin_scan(False)
+    subject = state.subject
+    subj_sptr = state.sptr
+    translated = state.translated
+
+    # A single match data block is borrowed from the pattern for the entire scan
+    match_data_ptr = state.code.borrow_match_data()
+    if match_data_ptr is NULL:
+        raise MemoryError
+    ovector = match_data_ovector(state.code._kind, match_data_ptr)
+    capture_count = match_data_ovector_count(state.code._kind, match_data_ptr) - 1
+
+    try:
+        while (maxsplit == 0 or count < maxsplit) and state.find(match_data_ptr, match_context):
+            count += 1
+
+            # The match data block is held until the scan completes, so its offsets are unchanged
+            # while pieces are consumed
+            yield copy_substring(subject, subj_sptr, translated, piece_offset, ovector[0])
+            for number in range(1, capture_count + 1):
+                if ovector[2 * number] == PCRE2_UNSET:
+                    yield None
+                else:
+                    yield copy_substring(
+                        subject, subj_sptr, translated, ovector[2 * number], ovector[2 * number + 1]
+                    )
+            piece_offset = ovector[1]
+
+            if not state.advance(ovector):
+                break
+    finally:
+        state.code.return_match_data(match_data_ptr)
+
+    yield copy_substring(subject, subj_sptr, translated, piece_offset, state.byte_length)
+
+
+def match_at(
+    PCRE2Code code not None,
+    object subject,
+    size_t length, # length & positions in logical (index) units
+    object positions,
+    PCRE2MatchContext match_context not None,
+):
+    """
+    Attempt an anchored match at each of an iterable of positions, returning an `array('q')` of the
+    logical end index of each match, or -1 where there was none. As with `match`, positions are
+    clamped to the subject, and positions past the length never match. Positions are translated
+    incrementally from the previous one, so ascending positions take a single pass over the subject
+    """
+    cdef:
+        size_t subject_length = len(subject)
+        size_t byte_offset
+        size_t char_offset
+        size_t anchor_byte = 0
+        size_t anchor_char = 0
+        long long position
+        Py_ssize_t idx
+        Py_ssize_t n
+        size_t *ovector
+        pcre2_match_data_t *match_data_ptr
+        uint8_t *subj_sptr
+        int rc
+        size_t utf_checked_offset  # Byte offset from which the subject has been checked as UTF-8
+        array.array offsets
+        array.array ends
+        SubjectScan state
+
+    if isinstance(positions, array.array) and positions.typecode == "q":
+        offsets = positions
+    else:
+        offsets = array.array("q", positions)
+
+    # Prepared subjects are validated once, though each position must start a character. Otherwise
+    # each match checks the subject from its position, so later positions into immutable subjects
+    # need not be checked again (see `scan_utf_options`)
+    state = prepare_subject(code, subject, length, 0, match_context)
+    state.begin_scan(False)
+    subj_sptr = state.sptr
+    utf_checked_offset = state.byte_length + 1
+
+    n = len(offsets)
+    ends = array.clone(SPANS_TEMPLATE, n, zero=False)
+
+    # A single match data block is borrowed from the pattern for all positions
+    match_data_ptr = state.code.borrow_match_data()
+    if match_data_ptr is NULL:
+        raise MemoryError
+    ovector = match_data_ovector(state.code._kind, match_data_ptr)
+
+    try:
+        for idx in range(n):
+            position = offsets.data.as_longlongs[idx]
+            char_offset = 0 if position < 0 else min(<size_t>position, subject_length)
+            if char_offset > length:
+                ends.data.as_longlongs[idx] = -1
+                continue
+
+            # Translate from the previous position, or from the start if positions went backwards.
+            # The index of prepared subjects is used instead if the previous position is far off
+            if state.translated:
+                if state.handle is not None and not (
+                    anchor_char <= char_offset < anchor_char + SUBJECT_CHECKPOINT_INTERVAL
+                ):
+                    byte_offset = state.handle.idx_char_to_byte(subj_sptr, state.size, char_offset)
+                else:
+                    if char_offset < anchor_char:
+                        anchor_byte = anchor_char = 0
+                    byte_offset = idx_char_to_byte(
+                        subj_sptr, state.size, char_offset, anchor_byte, anchor_char
+                    )
+                anchor_byte = byte_offset
+                anchor_char = char_offset
+            else:
+                byte_offset = char_offset
+
+            rc = _pcre2_match(
+                state.code,
+                subj_sptr,
+                state.byte_length,
+                byte_offset,
+                PCRE2_ANCHORED | state.options | scan_utf_options(
+                    subj_sptr,
+                    state.size,
+                    byte_offset,
+                    state.utf_checked or byte_offset >= utf_checked_offset,
+                ),
+                match_data_ptr,
+                match_context,
+            )
+            if state.utf_scan and byte_offset < utf_checked_offset:
+                utf_checked_offset = byte_offset
+            if rc == PCRE2_ERROR_NOMATCH:
+                ends.data.as_longlongs[idx] = -1
+                continue
+            raise_from_rc(rc)
+
+            if state.translated:
+                ends.data.as_longlongs[idx] = idx_byte_to_char(
+                    subj_sptr, ovector[1], byte_offset, char_offset
+                )
+            else:
+                ends.data.as_longlongs[idx] = ovector[1]
+    finally:
+        state.code.return_match_data(match_data_ptr)
+
+    return ends
+
+
+# Masks of matched subjects are created by cloning an empty array of unsigned bytes
+cdef array.array MASK_TEMPLATE = array.array("B")
+
+
+def match_many(PCRE2Code code not None, object subjects, uint32_t options = 0):
+    """
+    Match a pattern without callouts against each subject of an iterable, returning an
+    `array('B')` mask that is 1 for subjects that matched. Subjects are viewed with the GIL held,
+    after which all of them are matched without it, reusing one match data block for each kind of
+    code used
+    """
+    cdef:
+        list items = list(subjects)  # Copied so subjects stay alive while matched without the GIL
+        Py_ssize_t n = len(items)
+        Py_ssize_t idx
+        object subject
+        PCRE2Code subject_code
+        PCRE2Code native_code
+        Subject handle
+        list kind_codes = [None] * 5  # Codes used, indexed by kind (see 'Code Unit Dispatch')
+        pcre2_code_t *kind_code_ptrs[5]
+        pcre2_match_data_t *kind_match_data[5]
+        pcre2_match_context_t *match_context_ptr = EMPTY_MATCH_CONTEXT.ptr
+        uint8_t **subj_sptrs = NULL
+        size_t *subj_sizes = NULL
+        uint8_t *subj_kinds = NULL
+        uint8_t kind
+        array.array mask
+        uint8_t *mask_ptr
+        int rc = 0
+
+    if code._pattern_is_str:
+        # Disable UTF-8 encoding checks for improved performance
+        options |= PCRE2_NO_UTF_CHECK
+
+    mask = array.clone(MASK_TEMPLATE, n, zero=True)
+    mask_ptr = mask.data.as_uchars
+    for kind in range(5):
+        kind_code_ptrs[kind] = NULL
+        kind_match_data[kind] = NULL
+
+    # Always allocate at least one entry, as allocations of zero bytes may return NULL
+    subj_sptrs = <uint8_t **>malloc((n + 1) * sizeof(uint8_t *))
+    subj_sizes = <size_t *>malloc((n + 1) * sizeof(size_t))
+    subj_kinds = <uint8_t *>malloc((n + 1) * sizeof(uint8_t))
+    try:
+        if subj_sptrs is NULL or subj_sizes is NULL or subj_kinds is NULL:
+            raise MemoryError
+
+        for idx in range(n):
+            subject = items[idx]
+            handle = None
+            if not (PyUnicode_CheckExact(subject) or PyBytes_CheckExact(subject)):
+                subject = typeguard_subject(subject)
+                handle = as_subject_handle(subject)
+                if handle is not None:
+                    subject = handle._subject
+                items[idx] = subject
+
+            check_subject_type(code, subject, handle)
+
+            # Match 'str' subjects in their native representation where possible
+            subject_code = code
+            native_code = code.native_code(subject, None)
+            if native_code is not None:
+                subject_code = native_code
+
+            kind = subject_code._kind
+            if kind_match_data[kind] is NULL:
+                kind_match_data[kind] = subject_code.borrow_match_data()
+                if kind_match_data[kind] is NULL:
+                    raise MemoryError
+                kind_codes[kind] = subject_code
+                kind_code_ptrs[kind] = subject_code.ptr
+
+            subj_sptrs[idx], subj_sizes[idx] = as_code_unit_sptr_and_size(subject_code, subject)
+            subj_kinds[idx] = kind
+
+        with nogil:
+            for idx in range(n):
+                kind = subj_kinds[idx]
+                rc = code_match(
+                    kind,
+                    kind_code_ptrs[kind],
+                    subj_sptrs[idx], subj_sizes[idx],
+                    0,
+                    options,
+                    kind_match_data[kind],
+                    match_context_ptr,
+                )
+                if rc >= 0:
+                    mask_ptr[idx] = 1
+                elif rc != PCRE2_ERROR_NOMATCH:
+                    break
+        if rc < 0 and rc != PCRE2_ERROR_NOMATCH:
+            raise_from_rc(rc)
+    finally:
+        for kind in range(5):
+            if kind_match_data[kind] is not NULL:
+                (<PCRE2Code>kind_codes[kind]).return_match_data(kind_match_data[kind])
+        free(subj_sptrs)
+        free(subj_sizes)
+        free(subj_kinds)
+
+    return mask
+
+
+cdef size_t scan(
+    PCRE2Code code,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context,
+    size_t limit,
+    size_t *end,  # Set to the logical end index of the last match, or the offset if there was none
+    bint overlapped = False,
+) except? 0:
+    """
+    Scan for matches as in `match_generator`, without creating match objects. At most `limit`
+    matches are scanned for if non-zero. Returns the number of matches found. Nothing is allocated
+    per match, as a single match data block is reused throughout
+    """
+    cdef:
+        size_t start_byte_offset
+        size_t end_byte_offset
+        size_t count = 0
+        size_t *ovector
+        pcre2_match_data_t *match_data_ptr
+        SubjectScan state
+
+    state = prepare_subject(code, subject, length, offset, match_context)
+    state.begin_scan(overlapped)
+    start_byte_offset = end_byte_offset = state.byte_offset
+
+    # A single match data block is borrowed from the pattern for the entire scan
+    match_data_ptr = state.code.borrow_match_data()
+    if match_data_ptr is NULL:
+        raise MemoryError
+    ovector = match_data_ovector(state.code._kind, match_data_ptr)
+
+    try:
+        while (limit == 0 or count < limit) and state.find(match_data_ptr, match_context):
+            count += 1
+            end_byte_offset = ovector[1]
+            if not state.advance(ovector):
+                break
+    finally:
+        state.code.return_match_data(match_data_ptr)
+
+    if state.translated:
+        end[0] = idx_byte_to_char(state.sptr, end_byte_offset, start_byte_offset, offset)
+    else:
+        end[0] = end_byte_offset
+    return count
+
+
+def match_scan(
+    PCRE2Code code not None,
+    object subject,
+    size_t length, # length & offset in logical (index) units
+    size_t offset,
+    PCRE2MatchContext match_context not None,
+    size_t limit = 0,
+    bint overlapped = False,
+):
+    """
+    Returns the tuple `(count, end)` of a scan for matches (see `scan`)
+    """
+    cdef size_t count, end
+    count = scan(code, subject, length, offset, match_context, limit, &end, overlapped)
+    return count, end
 
 
 # ============================================================================
@@ -702,21 +2102,93 @@ class SubstituteOption(IntFlag):
     UNSET_EMPTY = PCRE2_SUBSTITUTE_UNSET_EMPTY
     REPLACEMENT_ONLY = PCRE2_SUBSTITUTE_REPLACEMENT_ONLY
 
+cdef tuple _substitute(
+    PCRE2Code code,
+    object replacement,
+    object subject,
+    size_t length, # length & offset in code units
+    size_t offset,
+    uint32_t options,
+    pcre2_match_data_t *match_data_ptr,
+):
+    cdef:
+        int rc
+        int unit_size = code._kind if code._kind != 0 else 1
+        void *repl_copy = NULL
+        uint8_t *subj_sptr
+        uint8_t *repl_sptr
+        uint8_t *res_sptr
+        size_t subj_size, repl_size, res_size
+
+    # Get views into object memory, widening the replacement to the code units of the subject
+    subj_sptr, subj_size = as_code_unit_sptr_and_size(code, subject)
+    if code._kind != 0 and PyUnicode_KIND(replacement) != code._kind:
+        repl_copy = copy_code_units(replacement, code._kind)
+        repl_sptr, repl_size = <uint8_t *>repl_copy, PyUnicode_GET_LENGTH(replacement)
+    else:
+        repl_sptr, repl_size = as_code_unit_sptr_and_size(code, replacement)
+
+    # Make simple attempt at guess for required memory, unless match has already been made
+    res_size = length + (length // 2) if not options & PCRE2_SUBSTITUTE_MATCHED else 0
+    res_sptr = <uint8_t *>malloc(res_size * unit_size)
+    try:
+        # No match context (and so no callout) is used, so the GIL is always released
+        with nogil:
+            rc = code_substitute(
+                code._kind,
+                code.ptr,
+                subj_sptr, length,
+                offset,
+                options,
+                match_data_ptr,
+                repl_sptr, repl_size,
+                res_sptr, &res_size,
+            )
+            # Reattempt substitution if no memory, now with required size of buffer known
+            if rc == PCRE2_ERROR_NOMEMORY:
+                free(res_sptr)
+                res_sptr = <uint8_t *>malloc(res_size * unit_size)
+                rc = code_substitute(
+                    code._kind,
+                    code.ptr,
+                    subj_sptr, length,
+                    offset,
+                    options,
+                    match_data_ptr,
+                    repl_sptr, repl_size,
+                    res_sptr, &res_size,
+                )
+        raise_from_rc(rc)
+
+        # Non-error return code contains the number of substitutions made
+        if code._kind != 0:
+            return (PyUnicode_FromKindAndData(code._kind, res_sptr, res_size), rc)
+        res_obj = bytes(res_sptr[:res_size])
+        if PyUnicode_Check(subject):
+            # Match the type of the return object to the input object
+            res_obj = res_obj.decode("UTF-8")
+        return (res_obj, rc)
+
+    finally:
+        free(res_sptr)
+        free(repl_copy)
+
+
 def substitute(
     PCRE2Code code not None,
     object replacement,
     object subject,
-    size_t byte_offset, # in bytes - unlike _cy.match()
+    size_t byte_offset, # in code units - unlike _cy.match()
     uint32_t options = 0,
     PCRE2MatchData match_data = None,
 ):
     cdef:
-        int rc
         pcre2_match_data_t *match_data_ptr = NULL
         uint8_t *subj_sptr
-        uint8_t *repl_sptr
-        uint8_t *res_sptr
-        size_t subj_size, repl_size, res_size
+        size_t subj_size
+        size_t length
+        Subject handle
+        PCRE2Code native_code = None
 
     # Always compute the needed length if there is any overflow
     options |= PCRE2_SUBSTITUTE_OVERFLOW_LENGTH
@@ -724,14 +2196,12 @@ def substitute(
     # Add support for backslash escape characters and Python substitution forms
     options |= PCRE2_SUBSTITUTE_EXTENDED
 
-    # Although the error message says "cannot use..." there would actually be nothing wrong at all
-    # with removing this block and allowing it. It's simply a matter of policy and clarity, and to
-    # match Python's re module.
-    if code._pattern_is_str ^ PyUnicode_Check(subject):
-        if code._pattern_is_str:
-            raise TypeError("Cannot use a string pattern on a bytes-like object")
-        else:
-            raise TypeError("Cannot use a bytes pattern on a string-like object")
+    # Prepared subjects are matched through their view of the object
+    handle = as_subject_handle(subject)
+    if handle is not None:
+        subject = handle._subject
+
+    check_subject_type(code, subject, handle)
 
     # Similarly, ensure that there is a match between the type of subject and replacement.
     #
@@ -744,60 +2214,493 @@ def substitute(
     #
     # For policy and clarity, we additionally forbid using a 'str' replacement with a 'bytes'
     # subject, although there is no issue with that combination.
-    if PyUnicode_Check(subject) ^ PyUnicode_Check(replacement):
-        if PyUnicode_Check(subject):
+    if subject_is_str(subject, handle) ^ PyUnicode_Check(replacement):
+        if not PyUnicode_Check(replacement):
             raise TypeError("Cannot use a string subject with a bytes-like template")
         else:
             raise TypeError("Cannot use a bytes subject with a string-like template")
 
+    # Substitute into 'str' subjects in their native representation where possible, which requires
+    # that the replacement can be represented in the same code units
+    if match_data is not None:
+        if match_data._code._kind != 0:
+            native_code = match_data._code
+    else:
+        native_code = code.native_code(subject, None)
+
+    if native_code is not None and PyUnicode_KIND(replacement) <= native_code._kind:
+        if match_data is not None:
+            match_data_ptr = match_data.ptr
+            options |= PCRE2_SUBSTITUTE_MATCHED
+        else:
+            # Borrow match data from the pattern rather than having PCRE2 allocate a block
+            match_data_ptr = native_code.borrow_match_data()
+            if match_data_ptr is NULL:
+                raise MemoryError
+        try:
+            return _substitute(
+                native_code,
+                replacement,
+                subject,
+                PyUnicode_GET_LENGTH(subject),
+                byte_offset,
+                options,
+                match_data_ptr,
+            )
+        except LibraryError:
+            # Escapes in the replacement may refer to characters beyond the range of the code units,
+            # which is only supported by UTF-8
+            options &= ~PCRE2_SUBSTITUTE_MATCHED
+        finally:
+            if match_data is None:
+                native_code.return_match_data(match_data_ptr)
+
     # Get views into object memory
-    repl_sptr, repl_size = as_sptr_and_size(replacement)
     subj_sptr, subj_size = as_sptr_and_size(subject)
+    length = subj_size
+
+    # Matches made natively are found again as UTF-8, with the same options over the same range
+    if native_code is not None and match_data is not None:
+        length = idx_char_to_byte(subj_sptr, subj_size, match_data._length)
+        byte_offset = idx_char_to_byte(subj_sptr, subj_size, byte_offset)
+        match_data = None
 
     # Disable UTF-8 encoding checks for improved performance
-    if match_data is None and PyUnicode_Check(subject):
+    if match_data is None and subject_is_str(subject, handle):
         options |= PCRE2_NO_UTF_CHECK
 
     if match_data is not None:
         match_data_ptr = match_data.ptr
         options |= PCRE2_SUBSTITUTE_MATCHED
+    else:
+        # Borrow match data from the pattern rather than having PCRE2 allocate a block
+        match_data_ptr = code.borrow_match_data()
+        if match_data_ptr is NULL:
+            raise MemoryError
 
-    # Make simple attempt at guess for required memory, unless match has already been made
-    res_size = subj_size + (subj_size // 2) if match_data is None else 0
-    res_sptr = <uint8_t *>malloc(res_size * sizeof(uint8_t))
     try:
-        rc = pcre2_substitute(
-            code.ptr,
-            subj_sptr, subj_size,
-            byte_offset,
-            options,
-            match_data_ptr,
-            NULL,
-            repl_sptr, repl_size,
-            res_sptr, &res_size,
+        res, rc = _substitute(
+            code, replacement, subject, length, byte_offset, options, match_data_ptr
         )
-        # Reattempt substitution if no memory, now with required size of buffer known
-        if rc == PCRE2_ERROR_NOMEMORY:
-            free(res_sptr)
-            res_sptr = <uint8_t *>malloc(res_size * sizeof(uint8_t))
-            rc = pcre2_substitute(
-                code.ptr,
-                subj_sptr, subj_size,
-                byte_offset,
-                options,
-                match_data_ptr,
-                NULL,
-                repl_sptr, repl_size,
-                res_sptr, &res_size,
+    finally:
+        if match_data is None:
+            code.return_match_data(match_data_ptr)
+
+    # Substitutions into encoded 'str' subjects (see `Subject`) are decoded as usual
+    if handle is not None and handle._encoded:
+        res = res.decode("UTF-8")
+    return (res, rc)
+
+
+# ============================================================================
+#                                                               Pattern Object
+
+# Compiled patterns, extended by `pcre2.Pattern`. Searches on exact 'str' and 'bytes' subjects are
+# handled here in full, so that short subjects are not dominated by the overhead of the call. Match
+# contexts for callout functions are made by the `_get_match_context(string, subject)` method of
+# the subclass, which wraps callouts in Python objects
+@cython.auto_pickle(False)
+cdef class Pattern:
+    cdef readonly PCRE2Code _pcre2_code
+    cdef readonly object pattern
+    cdef readonly object flags
+    cdef readonly bint jit
+    cdef PCRE2Code _replaced_code  # Code swapped out by `_set_jit_code`, which may still be in use
+    cdef readonly object callout
+    cdef readonly object offsets
+    cdef bint _byte_offsets
+    cdef readonly uint32_t groups
+    cdef readonly object groupindex
+    cdef readonly tuple _group_names  # Name of each group by number, or None if unnamed
+    cdef object __weakref__
+
+    def __init__(self, pcre2_code, pattern, flags, jit, callout, offsets="chars"):
+        if not isinstance(pcre2_code, PCRE2Code):
+            raise ValueError(
+                "PCRE2 code must be of type `_cy.PCRE2Code`. It is not recommended to instantiate "
+                "`Pattern` objects directly. Instead, use `pcre2.compile`."
             )
-        raise_from_rc(rc)
+        if offsets not in ("chars", "bytes"):
+            raise ValueError("Offsets must be either 'chars' or 'bytes'")
+        self._pcre2_code = pcre2_code
+        self.offsets = offsets
+        self._byte_offsets = offsets == "bytes"
+        self.pattern = pattern
+        self.flags = flags
+        self.jit = jit
+        self.callout = callout
+
+        # Group information is looked up for every group access, so compute it once per instance
+        self.groups = pattern_capture_count(pcre2_code)
+        name_dict = pattern_name_dict(pcre2_code)
+        self.groupindex = MappingProxyType(name_dict)
+        group_names = [None] * (self.groups + 1)
+        for name, number in name_dict.items():
+            group_names[number] = name
+        self._group_names = tuple(group_names)
+
+    def _set_jit_code(self, PCRE2Code pcre2_code not None):
+        """
+        Swaps in a JIT compiled copy of the code, unless the pattern is already JIT compiled. The
+        code and flag change together, and the replaced code is kept alive for matches in other
+        threads that may still be using it
+        """
+        with cython.critical_section(self):
+            if not self.jit:
+                self._replaced_code = self._pcre2_code
+                self._pcre2_code = pcre2_code
+                self.jit = True
 
-        # Non-error return code contains the number of substitutions made
-        res_obj = bytes(res_sptr[:res_size])
-        if PyUnicode_Check(subject):
-            # Match the type of the return object to the input object
-            res_obj = res_obj.decode("UTF-8")
-        return (res_obj, rc)
+    cpdef object _typeguard_subject(self, object string):
+        """
+        Returns the object to match for a subject (see `typeguard_subject`). With byte offsets,
+        'str' subjects are matched as their UTF-8 encoding
+        """
+        cdef Subject handle
+        if self._byte_offsets:
+            handle = as_subject_handle(string)
+            if PyUnicode_Check(string) or (
+                handle is not None and not handle._encoded and PyUnicode_Check(handle._subject)
+            ):
+                return Subject(string, "bytes")
+        return typeguard_subject(string)
+
+    cdef object _search(self, object string, Py_ssize_t pos, Py_ssize_t endpos, uint32_t options):
+        cdef:
+            object subject = self._typeguard_subject(string)
+            PCRE2MatchContext match_context = EMPTY_MATCH_CONTEXT
+            PCRE2MatchData match_data
+            Py_ssize_t length = len(subject)
+            size_t byte_offset
+
+        if self.callout is not None:
+            match_context = self._get_match_context(string, subject)
+
+        pos = max(0, min(pos, length))
+        endpos = max(0, min(endpos, length))
+        match_data = match(
+            self._pcre2_code, subject, endpos, pos, match_context, &options, &byte_offset
+        )
+        if match_data is None:
+            return None
+        return Match.from_match_data(
+            match_data, self, string, subject, pos, endpos, byte_offset, options
+        )
 
-    finally:
-        free(res_sptr)
+    cdef size_t _scan(
+        self, object string, Py_ssize_t pos, Py_ssize_t endpos, size_t limit, bint overlapped
+    ) except? 0:
+        cdef:
+            object subject = self._typeguard_subject(string)
+            PCRE2MatchContext match_context = EMPTY_MATCH_CONTEXT
+            Py_ssize_t length = len(subject)
+            size_t end
+
+        if self.callout is not None:
+            match_context = self._get_match_context(string, subject)
+
+        pos = max(0, min(pos, length))
+        endpos = max(0, min(endpos, length))
+        return scan(
+            self._pcre2_code, subject, endpos, pos, match_context, limit, &end, overlapped
+        )
+
+    def search(self, string, Py_ssize_t pos = 0, Py_ssize_t endpos = PY_SSIZE_T_MAX):
+        """
+        Scan through `string` looking for a match to the pattern, returning a Match object, or None
+        if no match was found.
+        """
+        return self._search(string, pos, endpos, 0)
+
+    def match(self, string, Py_ssize_t pos = 0, Py_ssize_t endpos = PY_SSIZE_T_MAX):
+        """
+        Match the pattern at the start of `string`, returning a Match object, or None if no match
+        was found.
+        """
+        return self._search(string, pos, endpos, PCRE2_ANCHORED)
+
+    def fullmatch(self, string, Py_ssize_t pos = 0, Py_ssize_t endpos = PY_SSIZE_T_MAX):
+        """
+        Match the pattern to all of `string`, returning a Match object, or None if no match was
+        found.
+        """
+        return self._search(string, pos, endpos, PCRE2_ANCHORED | PCRE2_ENDANCHORED)
+
+    def count(
+        self,
+        string,
+        Py_ssize_t pos = 0,
+        Py_ssize_t endpos = PY_SSIZE_T_MAX,
+        *,
+        bint overlapped = False,
+    ):
+        """
+        Return the number of non-overlapping matches of the pattern in `string`, without creating
+        Match objects. If `overlapped` is true, matches starting at every character are counted,
+        and so may overlap.
+        """
+        return self._scan(string, pos, endpos, 0, overlapped)
+
+    def contains(self, string, Py_ssize_t pos = 0, Py_ssize_t endpos = PY_SSIZE_T_MAX):
+        """
+        Return whether the pattern matches anywhere in `string`, without creating a Match object.
+        """
+        return self._scan(string, pos, endpos, 1, False) != 0
+
+
+# ============================================================================
+#                                                                 Match Object
+
+@freelist(8)
+cdef class Match:
+    cdef PCRE2MatchData _match_data
+    cdef readonly Pattern re
+    cdef readonly object string
+    cdef object _subject  # Matched view of `string`, which may share its memory
+    cdef readonly object pos
+    cdef readonly object endpos
+    cdef size_t _byte_offset
+    cdef uint32_t _options
+
+    def __init__(
+        self,
+        pcre2_match_data,
+        re,
+        string,
+        subject,
+        pos,
+        endpos,
+        size_t byte_offset,
+        uint32_t options,
+    ):
+        if not isinstance(pcre2_match_data, PCRE2MatchData):
+            raise ValueError(
+                "PCRE2 match data must be of type `_cy.PCRE2MatchData`. It is not recommended to "
+                "instantiate `Match` objects directly. Instead, use `Pattern.match`."
+            )
+        if type(subject) is Subject:
+            string = (<Subject>subject).string
+            subject = (<Subject>subject)._subject
+        self._match_data = pcre2_match_data
+        self.re = re
+        self.string = string
+        self._subject = subject
+        self.pos = pos
+        self.endpos = endpos
+        self._byte_offset = byte_offset
+        self._options = options
+
+    @staticmethod
+    cdef Match from_match_data(
+        PCRE2MatchData match_data,
+        Pattern re,
+        object string,
+        object subject,
+        object pos,
+        object endpos,
+        size_t byte_offset,
+        uint32_t options,
+    ):
+        """ Skips argument checks of the constructor, for matches made by the module """
+        cdef Match m
+        if type(subject) is Subject:
+            string = (<Subject>subject).string
+            subject = (<Subject>subject)._subject
+        m = Match.__new__(Match)
+        m._match_data = match_data
+        m.re = re
+        m.string = string
+        m._subject = subject
+        m.pos = pos
+        m.endpos = endpos
+        m._byte_offset = byte_offset
+        m._options = options
+        return m
+
+    def __repr__(self):
+        return (
+            f"<pcre2.Match object; span={self.span()}, match={repr(self.group())}>"
+        )
+
+    cdef Py_ssize_t _group_number(self, object group) except -1:
+        if isinstance(group, str):
+            number = self.re.groupindex.get(group)
+            if number is None:
+                raise IndexError("no such group")
+            return number
+        if not PyIndex_Check(group):
+            raise IndexError("No such group")
+        number = PyNumber_Index(group)
+        if not 0 <= number < self._match_data._ovector_count:
+            raise IndexError("No such group")
+        return number
+
+    cdef tuple _span(self, Py_ssize_t number):
+        cdef:
+            PCRE2MatchData match_data = self._match_data
+            uint8_t *subj_sptr
+            size_t subj_size
+            size_t start
+            size_t start_byte
+            size_t end
+
+        start = match_data._ovector[2 * number]
+        end = match_data._ovector[2 * number + 1]
+        if start == PCRE2_UNSET:
+            return (-1, -1)
+
+        if is_translated(self._subject, match_data._code._kind):
+            # Get views into object memory
+            subj_sptr, subj_size = as_sptr_and_size(self._subject)
+
+            start_byte = start
+            start = idx_byte_to_char(
+                subj_sptr, start_byte, match_data._anchor_byte, match_data._anchor_char
+            )
+            end = idx_byte_to_char(subj_sptr, end, start_byte, start)
+
+        return (start, end)
+
+    cdef object _substring(self, Py_ssize_t number, object default):
+        cdef:
+            PCRE2MatchData match_data = self._match_data
+            uint8_t *subj_sptr
+            size_t subj_size
+            size_t start
+            size_t end
+
+        start = match_data._ovector[2 * number]
+        end = match_data._ovector[2 * number + 1]
+        if start == PCRE2_UNSET:
+            return default
+
+        # Slice 'str' subjects directly, rather than decoding the matched UTF-8
+        if PyUnicode_Check(self._subject):
+            if is_translated(self._subject, match_data._code._kind):
+                start, end = self._span(number)
+            return PyUnicode_Substring(self._subject, start, end)
+
+        # Start of a match may be after its end when \K is used in an assertion
+        if end < start:
+            end = start
+        subj_sptr, subj_size = as_sptr_and_size(self._subject)
+        return PyBytes_FromStringAndSize(<char *>subj_sptr + start, end - start)
+
+    def expand(self, template):
+        """
+        Return the string obtained by substitution on the template string `template`.
+        """
+        cdef uint32_t options
+
+        if isinstance(template, str):
+            template = str(template)
+        elif isinstance(template, (bytes, bytearray, memoryview)):
+            template = bytes(template)
+        else:
+            raise TypeError(f"Cannot process type {template}")
+
+        # Matches on encoded 'str' subjects (see `Subject`) are expanded into the same encoding
+        subject = self._subject
+        if self.re._pcre2_code._pattern_is_str and not PyUnicode_Check(subject):
+            subject = encoded_subject(self.string, subject)
+
+        options = self._options | PCRE2_SUBSTITUTE_REPLACEMENT_ONLY | PCRE2_SUBSTITUTE_UNSET_EMPTY
+        if not PyUnicode_Check(template):
+            # The subject has already been checked, but bytes templates must still be checked as
+            # UTF-8 for patterns with UTF support
+            options &= ~PCRE2_NO_UTF_CHECK
+        res, _ = substitute(
+            self.re._pcre2_code,
+            template,
+            subject,
+            self._byte_offset,
+            options=options,
+            match_data=self._match_data,
+        )
+        return res
+
+    def span(self, group=0):
+        """
+        Return the start and end of `group` as the tuple `(start, end)`.
+
+        If `group` did not contribute to the match, `(-1, -1)` is returned.
+        """
+        return self._span(self._group_number(group))
+
+    def __getitem__(self, group):
+        return self._substring(self._group_number(group), None)
+
+    def group(self, *groups):
+        """
+        Returns one or more subgroups of the match.
+
+        If there is a single argument, the result is a single string. If there are multiple
+        arguments, the result is a tuple with one item per argument. Without arguments, the whole
+        match is returned.
+        """
+        if not groups:
+            return self._substring(0, None)
+        if len(groups) == 1:
+            return self._substring(self._group_number(groups[0]), None)
+        return tuple([self._substring(self._group_number(group), None) for group in groups])
+
+    def groups(self, default=None):
+        """
+        Return a tuple containing all the subgroups of the match.
+        """
+        cdef Py_ssize_t number
+        return tuple([
+            self._substring(number, default)
+            for number in range(1, self._match_data._ovector_count)
+        ])
+
+    def groupdict(self, default=None):
+        """
+        Return a dictionary mapping subgroup name to group number for all the named subgroups.
+        """
+        return {
+            group: self._substring(number, default)
+            for group, number in self.re.groupindex.items()
+        }
+
+    def start(self, group=0):
+        """
+        Return the start index of the substring matched by `group`.
+        """
+        return self.span(group)[0]
+
+    def end(self, group=0):
+        """
+        Return the end index of the substring matched by `group`.
+        """
+        return self.span(group)[1]
+
+    @property
+    def lastindex(self):
+        cdef:
+            size_t *ovector = self._match_data._ovector
+            Py_ssize_t number
+            Py_ssize_t max_number = 0
+            size_t max_end = 0
+
+        # We look for the rightmost right parenthesis by keeping the first group that ends at
+        # max_end because that is the leftmost/outermost group when there are nested groups!
+        for number in range(1, self._match_data._ovector_count):
+            if ovector[2 * number] == PCRE2_UNSET:
+                continue
+            if max_number == 0 or max_end < ovector[2 * number + 1]:
+                max_end = ovector[2 * number + 1]
+                max_number = number
+        return max_number if max_number != 0 else None
+
+    @property
+    def lastgroup(self):
+        max_group = self.lastindex
+        if max_group is None:
+            return None
+        return self.re._group_names[max_group]
+
+
+# Match and subject objects are exposed by `pcre2` rather than this module, so are named after it
+(<PyTypeObject *>Match).tp_name = "pcre2.Match"
+(<PyTypeObject *>Subject).tp_name = "pcre2.Subject"
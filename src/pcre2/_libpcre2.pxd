@@ -1,6 +1,6 @@
 # -*- coding:utf-8 -*-
 
-from libc.stdint cimport uint8_t, uint32_t, int32_t
+from libc.stdint cimport uint8_t, uint16_t, uint32_t, int32_t
 
 
 cdef extern from "pcre2.h":
@@ -399,7 +399,7 @@ cdef extern from "pcre2.h":
     int pcre2_jit_compile(
         pcre2_code_t *code,
         uint32_t options
-    )
+    ) nogil
 
 
     void pcre2_code_free(pcre2_code_t *code)
@@ -446,7 +446,7 @@ cdef extern from "pcre2.h":
         uint32_t options,
         pcre2_match_data_t *match_data,
         pcre2_match_context_t *mcontext
-    )
+    ) nogil
     int pcre2_jit_match(
         const pcre2_code_t *code,
         pcre2_sptr_t subject,
@@ -510,7 +510,7 @@ cdef extern from "pcre2.h":
         size_t rlength,
         uint8_t *outputbuffer,
         size_t *outlengthptr
-    )
+    ) nogil
 
     # Serialization.
     int32_t pcre2_serialize_decode(
@@ -520,10 +520,129 @@ cdef extern from "pcre2.h":
         pcre2_general_context_t *gcontex
     )
     int32_t pcre2_serialize_encode(
-        pcre2_code_t **codes,
+        const pcre2_code_t **codes,
         int32_t number_of_codes,
         uint8_t **serialized_bytes,
         size_t *serialized_size,
         pcre2_general_context_t *gcontex
     )
     void pcre2_serialize_free(uint8_t *bytes)
+
+
+# Declarations for the 16-bit and 32-bit libraries, used to match 'str' objects in their native
+# representation. Only the subset of the API needed for matching and substitution is declared.
+cdef extern from "pcre2.h":
+    ctypedef const uint16_t *pcre2_sptr16_t "PCRE2_SPTR16"
+    ctypedef const uint32_t *pcre2_sptr32_t "PCRE2_SPTR32"
+
+    # Opaque handles for PCRE2 defined structs.
+    ctypedef struct pcre2_code_16_t "pcre2_code_16":
+        pass
+    ctypedef struct pcre2_code_32_t "pcre2_code_32":
+        pass
+    ctypedef struct pcre2_match_data_16_t "pcre2_match_data_16":
+        pass
+    ctypedef struct pcre2_match_data_32_t "pcre2_match_data_32":
+        pass
+    ctypedef struct pcre2_general_context_16_t "pcre2_general_context_16":
+        pass
+    ctypedef struct pcre2_general_context_32_t "pcre2_general_context_32":
+        pass
+    ctypedef struct pcre2_compile_context_16_t "pcre2_compile_context_16":
+        pass
+    ctypedef struct pcre2_compile_context_32_t "pcre2_compile_context_32":
+        pass
+    ctypedef struct pcre2_match_context_16_t "pcre2_match_context_16":
+        pass
+    ctypedef struct pcre2_match_context_32_t "pcre2_match_context_32":
+        pass
+
+    # Pattern compilation functions.
+    pcre2_code_16_t * pcre2_compile_16(
+        pcre2_sptr16_t pattern,
+        size_t length,
+        uint32_t options,
+        int *errorcode,
+        size_t *erroroffset,
+        pcre2_compile_context_16_t *ccontext
+    )
+    pcre2_code_32_t * pcre2_compile_32(
+        pcre2_sptr32_t pattern,
+        size_t length,
+        uint32_t options,
+        int *errorcode,
+        size_t *erroroffset,
+        pcre2_compile_context_32_t *ccontext
+    )
+
+    int pcre2_jit_compile_16(pcre2_code_16_t *code, uint32_t options) nogil
+    int pcre2_jit_compile_32(pcre2_code_32_t *code, uint32_t options) nogil
+
+    void pcre2_code_free_16(pcre2_code_16_t *code)
+    void pcre2_code_free_32(pcre2_code_32_t *code)
+
+    # Matching and match data functions.
+    pcre2_match_data_16_t * pcre2_match_data_create_from_pattern_16(
+        const pcre2_code_16_t *code,
+        pcre2_general_context_16_t *gcontext
+    )
+    pcre2_match_data_32_t * pcre2_match_data_create_from_pattern_32(
+        const pcre2_code_32_t *code,
+        pcre2_general_context_32_t *gcontext
+    )
+
+    int pcre2_match_16(
+        const pcre2_code_16_t *code,
+        pcre2_sptr16_t subject,
+        size_t length,
+        size_t startoffset,
+        uint32_t options,
+        pcre2_match_data_16_t *match_data,
+        pcre2_match_context_16_t *mcontext
+    ) nogil
+    int pcre2_match_32(
+        const pcre2_code_32_t *code,
+        pcre2_sptr32_t subject,
+        size_t length,
+        size_t startoffset,
+        uint32_t options,
+        pcre2_match_data_32_t *match_data,
+        pcre2_match_context_32_t *mcontext
+    ) nogil
+
+    void pcre2_match_data_free_16(pcre2_match_data_16_t *match_data)
+    void pcre2_match_data_free_32(pcre2_match_data_32_t *match_data)
+
+    uint32_t pcre2_get_ovector_count_16(pcre2_match_data_16_t *match_data)
+    uint32_t pcre2_get_ovector_count_32(pcre2_match_data_32_t *match_data)
+
+    size_t *pcre2_get_ovector_pointer_16(pcre2_match_data_16_t *match_data)
+    size_t *pcre2_get_ovector_pointer_32(pcre2_match_data_32_t *match_data)
+
+    # Substitution.
+    int pcre2_substitute_16(
+        const pcre2_code_16_t *code,
+        pcre2_sptr16_t subject,
+        size_t length,
+        size_t startoffset,
+        uint32_t options,
+        pcre2_match_data_16_t *match_data,
+        pcre2_match_context_16_t *mcontext,
+        pcre2_sptr16_t replacement,
+        size_t rlength,
+        uint16_t *outputbuffer,
+        size_t *outlengthptr
+    ) nogil
+    int pcre2_substitute_32(
+        const pcre2_code_32_t *code,
+        pcre2_sptr32_t subject,
+        size_t length,
+        size_t startoffset,
+        uint32_t options,
+        pcre2_match_data_32_t *match_data,
+        pcre2_match_context_32_t *mcontext,
+        pcre2_sptr32_t replacement,
+        size_t rlength,
+        uint32_t *outputbuffer,
+        size_t *outlengthptr
+    ) nogil
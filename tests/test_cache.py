@@ -0,0 +1,129 @@
+import pytest
+import pcre2
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    pcre2.purge()
+    yield
+    pcre2.set_cache_size(maxsize=512, maxbytes=64 * 1024 * 1024)
+    pcre2.purge()
+
+
+def test_cache_hits():
+    assert pcre2.match(r"(\w+)", "abc")[1] == "abc"
+    assert pcre2.search(r"(\w+)", "abc")[1] == "abc"
+    info = pcre2.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    assert info.currbytes > 0
+
+
+def test_cache_key():
+    pcre2.match("a", "a")
+    pcre2.match(b"a", b"a")
+    pcre2.match("a", "a", flags=pcre2.I)
+    pcre2.match("a", "a", jit=False)
+    assert pcre2.cache_info().currsize == 4
+    assert pcre2.match("a", "a").re is pcre2.match("a", "a").re
+    assert pcre2.match("a", "a").re is not pcre2.match("a", "a", jit=False).re
+
+
+def test_cache_jit_compiled():
+    # Patterns JIT compiled after being cached are no longer returned for their key
+    p = pcre2.match("a", "a", jit=False).re
+    p.jit_compile()
+    q = pcre2.match("a", "a", jit=False).re
+    assert q is not p and not q.jit
+    assert pcre2.cache_info().currsize == 1
+
+
+def test_cache_callout():
+    def callout(callout_block):
+        return pcre2.CalloutReturn.PASS
+
+    m1 = pcre2.match("a(?C1)", "a", callout=callout)
+    m2 = pcre2.match("a(?C1)", "a")
+    assert m1.re is not m2.re
+    assert m1.re.callout is callout
+
+
+def test_cache_bypass():
+    pcre2.match(bytearray(b"a"), b"a")
+    info = pcre2.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+
+
+def test_cache_eviction():
+    pcre2.set_cache_size(maxsize=2)
+    for patn in ("a", "b", "c"):
+        pcre2.match(patn, patn)
+    assert pcre2.cache_info().currsize == 2
+
+    # Least recently used pattern is evicted first
+    pcre2.match("b", "b")
+    assert pcre2.cache_info().hits == 1
+    pcre2.match("a", "a")
+    assert pcre2.cache_info().hits == 1
+
+
+def test_cache_byte_budget():
+    pcre2.match("a", "a")
+    size = pcre2.cache_info().currbytes
+    pcre2.set_cache_size(maxbytes=size)
+    pcre2.match("b", "b")
+    info = pcre2.cache_info()
+    assert info.currsize == 1 and info.currbytes <= size
+
+    pcre2.set_cache_size(maxbytes=0)
+    assert pcre2.cache_info().currsize == 0
+
+
+def test_purge():
+    pcre2.match("a", "a")
+    pcre2.purge()
+    assert pcre2.cache_info() == (0, 0, 512, 0, 64 * 1024 * 1024, 0)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    pcre2.set_cache_dir(tmp_path)
+    yield tmp_path
+    pcre2.set_cache_dir(None)
+
+
+def test_cache_dir(cache_dir):
+    p1 = pcre2.compile(r"(?<head>\w+)\s+(?<tail>\w+)", flags=pcre2.I)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # Warm start decodes the stored bytecode and JIT compiles it as usual
+    p2 = pcre2.compile(r"(?<head>\w+)\s+(?<tail>\w+)", flags=pcre2.I)
+    assert len(list(cache_dir.iterdir())) == 1
+    assert p2.jit and p2.groupindex == p1.groupindex
+    assert p2.match("FOO bar").groups() == p1.match("FOO bar").groups() == ("FOO", "bar")
+
+    pcre2.compile(rb"(?<head>\w+)\s+(?<tail>\w+)", flags=pcre2.I)
+    pcre2.compile(r"(?<head>\w+)\s+(?<tail>\w+)", flags=pcre2.A)
+    assert len(list(cache_dir.iterdir())) == 3
+    assert pcre2.compile(r"\w", flags=pcre2.A).match("é") is None
+    assert pcre2.compile(r"\w", flags=pcre2.A).match("é") is None
+
+
+@pytest.mark.parametrize("contents", [b"", b"PCRE2PY\x00", b"garbage" * 100])
+def test_cache_dir_invalid_entry(cache_dir, contents):
+    pcre2.compile(r"a+b")
+    (path,) = cache_dir.iterdir()
+
+    path.write_bytes(contents)
+    assert pcre2.compile(r"a+b").match("aab")[0] == "aab"
+
+    # Invalid entries are replaced after recompilation
+    assert path.read_bytes() != contents
+    assert pcre2.compile(r"a+b").match("aab")[0] == "aab"
+
+
+def test_cache_dir_truncated_entry(cache_dir):
+    pcre2.compile(r"a+b")
+    (path,) = cache_dir.iterdir()
+
+    path.write_bytes(path.read_bytes()[:-8])
+    assert pcre2.compile(r"a+b").match("aab")[0] == "aab"
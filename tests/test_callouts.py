@@ -74,3 +74,15 @@ def test_callout_block_persist():
 
     pcre2.search(r".+(?C'')(*FAIL)", "•bc", flags=pcre2.O0, callout=persist_blocks_callout)
     assert [block[0] for block in callout_blocks] == ["•bc", "•b", "•", "bc", "b", "c"]
+
+
+def test_callout_block_lastgroup():
+    callout_blocks = []
+
+    def persist_blocks_callout(callout_block):
+        callout_blocks.append(callout_block)
+
+    pattern = r"(?<a>a)(?C1)(?:(?<b>b)(?C'two')|(c)(?C3)x)"
+    pcre2.search(pattern, "ac ab", flags=pcre2.O0, callout=persist_blocks_callout)
+    blocks = [(block.value, block.lastindex, block.lastgroup) for block in callout_blocks]
+    assert blocks == [(1, 1, "a"), (3, 3, None), (1, 1, "a"), ("two", 2, "b")]
@@ -1,6 +1,10 @@
+import gc
+import mmap
 import pytest
 import pcre2
 import re
+import weakref
+from array import array
 
 
 # All tests should match successfully.
@@ -48,6 +52,9 @@ test_data_match_expand = [
     (b"[abc]+", b"$0", b"dabacbaccbacccb", 0, 0, b"abacbaccbacccb"),
     ("[abc]+", "$0", "dabacbaccbacccb", 0, 0, "abacbaccbacccb"),
     ("[abc]+", "$0", "dabacbaccbacccb", 0, 10, "acccb"),
+    (r"(\w)•$", "[$1]", "é•b•", 0, 1, "[b]"),
+    (r"(\w)•$", "[$1😀]", "é•b•", 0, 1, "[b😀]"),
+    (r"(\w)•", r"\x{1F600}$1", "é•", 0, 0, "😀é"),
 ]
 
 
@@ -56,3 +63,142 @@ def test_match_expand(pattern, replacement, subject, flags, pos, result):
     p = pcre2.compile(pattern, flags=flags)
     m = p.search(subject, pos=pos)
     assert m.expand(replacement) == result
+
+
+test_data_match_spans = [
+    (r"•(\w)", "a•b••c•d", 0),
+    (r"(?<=(•))\w", "a•b••c•d", 0),
+    (r"(?<=(••))(\w)|(•)", "•a••bé••c", 0),
+    (r"\w*", "é•éé••ééé", 0),
+    (r"(é)|(•)", "xé•xxé••", 3),
+    (r"(?<=(ab))(\w)|(-)", "-ab-abc--d", 2),
+    (r"\w*", "ab-cd--efg", 0),
+]
+
+
+@pytest.mark.parametrize("pattern,subject,pos", test_data_match_spans)
+def test_match_spans(pattern, subject, pos):
+    # Offsets are translated relative to the previous match, so check them against `re`
+    p = pcre2.compile(pattern)
+    r = re.compile(pattern)
+    matches = list(p.finditer(subject, pos))
+    expected = list(r.finditer(subject, pos))
+    assert len(matches) == len(expected)
+    for m, e in zip(matches, expected):
+        for group in range(p.groups + 1):
+            assert m.span(group) == e.span(group)
+            assert m[group] == e[group]
+    assert p.search(subject, pos).span(p.groups) == r.search(subject, pos).span(p.groups)
+
+
+def test_match_ascii_subject():
+    m = pcre2.compile(r"(\w+) (?<tail>\w+)?").search("-- ascii subject", 2)
+    assert m.span(1) == (3, 8) and m.span("tail") == (9, 16)
+    assert type(m[1]) is str and m.groups() == ("ascii", "subject")
+
+
+@pytest.mark.parametrize("subject", ["x b-c", "é b-c", "😀 b-c"])
+@pytest.mark.parametrize("flags", [0, pcre2.A])
+def test_match_groups(subject, flags):
+    m = pcre2.compile(r"(?<a>a)?(?<b>b)-(c)", flags=flags).search(subject)
+    assert m.groups() == (None, "b", "c") and m.groups("") == ("", "b", "c")
+    assert m.groupdict() == {"a": None, "b": "b"} and m.groupdict(0) == {"a": 0, "b": "b"}
+    assert m.group(0, "b", True) == ("b-c", "b", None)
+    assert m.lastindex == 3 and m.lastgroup is None
+    for group in (4, -1, "c", 1.0):
+        with pytest.raises(IndexError):
+            m[group]
+
+
+def test_match_repr():
+    m = pcre2.compile(r"(\w+)").search("-- abc")
+    assert repr(m) == "<pcre2.Match object; span=(3, 6), match='abc'>"
+    assert type(m) is pcre2.Match and pcre2.Match.__module__ == "pcre2"
+
+
+def test_match_lastgroup_release():
+    # Group information is held by each match, so subjects are released along with their matches
+    subject = array("B", b"ab")
+    ref = weakref.ref(subject)
+    m = pcre2.compile(rb"(?<x>a)(b)?").match(subject)
+    assert (m.lastindex, m.lastgroup) == (2, None)
+    assert pcre2.compile(rb"(?<x>a)").match(b"a").lastgroup == "x"
+    del subject, m
+    assert ref() is None
+
+
+def test_match_reference_cycle():
+    # Match data blocks are returned to their pattern even when collected as part of a cycle
+    class Cycle(list):
+        pass
+
+    p = pcre2.compile(rb"a+")
+    for _ in range(2000):
+        cycle = Cycle()
+        cycle.append(cycle)
+        cycle.append(p.search(b"xaa"))
+        cycle.append(pcre2.compile(rb"a").search(b"a"))
+        del cycle
+    gc.collect()
+    assert p.search(b"xaa").span() == (1, 3)
+
+
+test_data_match_native = [
+    # Non-ASCII subjects are matched in their native representation
+    (r"(\w)(\w*)", "café naïve ÉTÉ"),
+    (r"(?i)(é+)|(\xa0)", "ÉéÉ\xa0e"),
+    (r"(\w)(\w*)", "Ωμέγα•σΣς"),
+    (r"(?i)(σ+)|(•)", "ΣσςΣ••"),
+    (r"(?<=•)(\w+)", "a•bc••😀d•e"),
+    (r"(.)\s", "😀 a ✓ é "),
+    (r"(\w+)", "a\ud800bc\ud800é"),
+]
+
+
+@pytest.mark.parametrize("pattern,subject", test_data_match_native)
+def test_match_native(pattern, subject):
+    p = pcre2.compile(pattern)
+    r = re.compile(pattern)
+    matches = [(m.span(), m.groups()) for m in p.finditer(subject)]
+    assert matches == [(m.span(), m.groups()) for m in r.finditer(subject)]
+    assert p.sub(r"<$1>", subject) == r.sub(r"<\1>", subject)
+
+
+def test_match_native_ascii_flag():
+    # Without Unicode properties only ASCII characters are word characters
+    p = pcre2.compile(r"\w+", flags=pcre2.A)
+    assert p.findall("café naïve") == ["caf", "na", "ve"]
+    assert p.findall("ωcafé•") == ["caf"]
+
+
+def _anonymous_mmap(data):
+    m = mmap.mmap(-1, len(data))
+    m.write(data)
+    return m
+
+
+test_data_match_buffer = [bytearray, memoryview, _anonymous_mmap, lambda data: array("B", data)]
+
+
+@pytest.mark.parametrize("buffer_type", test_data_match_buffer)
+def test_match_buffer(buffer_type):
+    subject = buffer_type(b"key=value; other=thing")
+    p = pcre2.compile(rb"(\w+)=(\w+)")
+    m = p.search(subject, 3)
+    assert m.string is subject
+    assert m.span(2) == (17, 22) and m.groups() == (b"other", b"thing")
+    assert p.findall(subject) == [(b"key", b"value"), (b"other", b"thing")]
+    assert p.split(subject) == [b"", b"key", b"value", b"; ", b"other", b"thing", b""]
+    assert p.sub(rb"$2=$1", subject, count=1) == b"value=key; other=thing"
+    assert m.expand(rb"[$1]") == b"[other]"
+
+
+def test_match_buffer_export():
+    # Subjects are matched in place, so buffers cannot be resized while a match refers to them
+    subject = bytearray(b"abc")
+    m = pcre2.search(rb"b", subject)
+    with pytest.raises(BufferError):
+        subject.extend(b"d")
+    del m
+    subject.extend(b"d")
+    assert pcre2.search(rb"d", subject).span() == (3, 4)
@@ -1,5 +1,6 @@
 import pytest
 import pcre2
+from array import array
 from pcre2._cy import LibraryError
 
 
@@ -44,6 +45,18 @@ def test_pattern_jit_compile_success(pattern, flags, return_code):
     assert rc == return_code
 
 
+def test_pattern_jit_compile_later():
+    p = pcre2.compile(r"(\w+)", jit=False)
+    code = p._pcre2_code
+    p.jit_compile()
+    assert p.jit and p._pcre2_code is not code
+    assert p.search("abc")[1] == "abc"
+    p.jit_compile()
+    assert p.jit
+    with pytest.raises(AttributeError):
+        p.jit = False
+
+
 test_data_pattern_groupindex = [
     (b"(?<foo>a+b+)c*d*", 0, {"foo": 1}),
     ("(?<foo>a+b+)c*d*", 0, {"foo": 1}),
@@ -80,6 +93,21 @@ def test_pattern_match_success(pattern, subject, flags, pos, return_code):
     assert rc == return_code
 
 
+class _Str(str):
+    pass
+
+
+@pytest.mark.parametrize("subject", ["xab", _Str("xab"), "éab"])
+def test_pattern_search_bounds(subject):
+    p = pcre2.compile(r"a(b)?")
+    assert p.search(subject, -5, 100).span(1) == (2, 3)
+    assert p.search(subject, 1, 2).span() == (1, 2) and p.search(subject, 5) is None
+    assert p.match(subject) is None and p.match(subject, 1).end() == 3
+    assert p.fullmatch(subject, 1) and p.fullmatch(subject, 1, 2)[0] == "a"
+    with pytest.raises(TypeError):
+        p.search(b"xab")
+
+
 test_data_pattern_scan_length = [
     (b".+", b"abacbaccbacccb", 0, 1),
     (b".*", b"abacbaccbacccb", 0, 2),
@@ -235,3 +263,325 @@ def test_pattern_jit_split():
     assert pcre2.split(":", "a:b:c:d", maxsplit=2) == ["a", "b", "c:d"]
     assert pcre2.split("(:)", ":a:b::c", maxsplit=2) == ["", ":", "a", ":", "b::c"]
     assert pcre2.split("(:+)", ":a:b::c", maxsplit=2) == ["", ":", "a", ":", "b::c"]
+
+
+def test_pattern_splititer():
+    p = pcre2.compile(r"(•)|(,)")
+    pieces = p.splititer("a•b,é")
+    assert next(pieces) == "a" and next(pieces) == "•" and next(pieces) is None
+    assert list(pieces) == ["b", None, ",", "é"]
+    assert list(p.splititer("a•b,é", maxsplit=1)) == ["a", "•", None, "b,é"]
+    assert list(p.splititer("a•b,é", maxsplit=-1)) == ["a•b,é"]
+    assert list(pcre2.compile(rb",").splititer(bytearray(b"a,,b"))) == [b"a", b"", b"b"]
+
+
+test_data_pattern_pickle = [
+    (b"(?<foo>a+b+)c*d*", 0, True, b"xaabbcd"),
+    ("(?<foo>a+b+)c*d*", pcre2.I, True, "xAaBbcd"),
+    ("(?<ƒøø>•+)(\\w)", 0, False, "a••b"),
+    (r"\w+", pcre2.A, True, "éa"),
+]
+
+
+@pytest.mark.parametrize("pattern,flags,jit,subject", test_data_pattern_pickle)
+def test_pattern_pickle(pattern, flags, jit, subject):
+    import pickle
+
+    p = pcre2.compile(pattern, flags=flags, jit=jit)
+    q = pickle.loads(pickle.dumps(p))
+    assert (q.pattern, q.flags, q.jit, q.groupindex) == (p.pattern, p.flags, p.jit, p.groupindex)
+    assert q.search(subject).span() == p.search(subject).span()
+    assert q.search(subject).groups() == p.search(subject).groups()
+
+
+def test_pattern_pickle_version_fallback():
+    p = pcre2.compile(r"(a+)(b+)", flags=pcre2.I)
+    func, (pattern, flags, jit, callout, _, code_bytes) = p.__reduce__()
+
+    # Bytecode from another library version is ignored in favor of the pattern source
+    q = func(pattern, flags, jit, callout, "0.0", b"")
+    assert q.match("AAbb").groups() == ("AA", "bb")
+
+
+def test_pattern_match_data_reuse():
+    p = pcre2.compile(r"(\w)(\d)")
+    subject = " ".join(f"{c}{i % 10}" for i, c in enumerate("abcdefghijklmnopqrstuvwxyz"))
+
+    # Match data blocks are recycled once released, so matches kept alive must be unaffected
+    matches = list(p.finditer(subject))
+    assert [m.groups() for m in matches] == p.findall(subject)
+    assert [m.span() for m in matches] == [(3 * i, 3 * i + 2) for i in range(26)]
+    for _ in range(10):
+        assert p.search("no match here") is None
+        assert p.search("  z9")[0] == "z9"
+
+
+@pytest.mark.parametrize("pattern,subject,pos,iter_length", test_data_pattern_scan_length)
+def test_pattern_count(pattern, subject, pos, iter_length):
+    p = pcre2.compile(pattern)
+    assert p.count(subject, pos) == iter_length
+    assert p.contains(subject, pos) is bool(p.search(subject, pos))
+    assert p.count(subject, 1, 5) == len(list(p.finditer(subject, 1, 5)))
+
+
+def test_pattern_count_subjects():
+    assert pcre2.compile(r"x*").count("é•😀") == 4
+    assert pcre2.compile(r"\w", flags=pcre2.A).count("é•x") == 1
+    assert pcre2.compile(rb"\d").count(bytearray(b"a1b22")) == 3
+    assert pcre2.compile(r"•").contains("a•b")
+    assert not pcre2.compile(r"c", jit=False).contains("a•b")
+    with pytest.raises(TypeError):
+        pcre2.compile(r"a").count(b"a")
+
+
+test_data_pattern_overlapped = [
+    (r"(\w)\w", "abcé😀dé•fg", 0, [(0, 2), (1, 3), (2, 4), (5, 7), (8, 10)]),
+    (r"x*", "ab😀", 0, [(0, 0), (1, 1), (2, 2), (3, 3)]),
+    (r"agggtaaa|tttaccct", "agggtaaagggtaaa", 0, [(0, 8), (7, 15)]),
+    (r"(?i)σσ", "ΣσςΣ", 0, [(0, 2), (1, 3), (2, 4)]),
+    (rb"\w\w", "ééé".encode(), pcre2.U, [(0, 4), (2, 6)]),
+    (rb"aa", b"aaaa", 0, [(0, 2), (1, 3), (2, 4)]),
+]
+
+
+@pytest.mark.parametrize("pattern,subject,flags,spans", test_data_pattern_overlapped)
+def test_pattern_overlapped(pattern, subject, flags, spans):
+    p = pcre2.compile(pattern, flags=flags)
+    assert [m.span() for m in p.finditer(subject, overlapped=True)] == spans
+    assert p.count(subject, overlapped=True) == len(spans)
+    pos = spans[1][0]
+    assert [m.span() for m in p.finditer(subject, pos, overlapped=True)] == spans[1:]
+
+
+test_data_pattern_finditer_spans = [
+    (r"(\w)(\d)?", "a1 é b 😀c2" * 50, 0),
+    (r"(?<=(é))\w", "aébéc", 0),
+    (r"x*", "é•😀", 0),
+    (r"(?<x>\w)(\d)?", "a1 é b c2" * 50, pcre2.A),
+    (rb"(a)|b", b"ab ba", 0),
+]
+
+
+@pytest.mark.parametrize("pattern,subject,flags", test_data_pattern_finditer_spans)
+def test_pattern_finditer_spans(pattern, subject, flags):
+    p = pcre2.compile(pattern, flags=flags)
+    groups = tuple(range(p.groups + 1))
+    expected = [x for m in p.finditer(subject, 2) for group in groups for x in m.span(group)]
+    (block,) = p.finditer_spans(subject, 2, groups=groups)
+    assert block.typecode == "q" and block.tolist() == expected
+
+    blocks = list(p.finditer_spans(subject, 2, groups=groups, batch=3))
+    assert all(len(block) == 3 * 2 * len(groups) for block in blocks[:-1])
+    assert [x for block in blocks for x in block] == expected
+
+
+def test_pattern_finditer_spans_groups():
+    p = pcre2.compile(r"(?<key>\w+)=(?<value>\w+)?")
+    spans = list(p.finditer_spans("a=1 b=", groups=("value", 0)))
+    assert spans == [array("q", [2, 3, 0, 3, -1, -1, 4, 6])]
+    assert list(pcre2.compile(r"x").finditer_spans("abc")) == []
+    for groups in ((3,), ("other",), ()):
+        with pytest.raises((IndexError, ValueError)):
+            list(p.finditer_spans("a=1", groups=groups))
+
+
+test_data_pattern_match_at = [
+    (r"\w+|\s+|.", "abc é😀 d•é  x", 0),
+    (r"(?<=é)\w*", "aéb éé", 0),
+    (r"\w", "é•x", pcre2.A),
+    (rb"[a-z]+", b"abc de", 0),
+]
+
+
+@pytest.mark.parametrize("pattern,subject,flags", test_data_pattern_match_at)
+def test_pattern_match_at(pattern, subject, flags):
+    p = pcre2.compile(pattern, flags=flags)
+    positions = [3, 1, 0, -2, len(subject), len(subject) + 1, 4, 2, 5]
+    for endpos in (len(subject), 4):
+        expected = [
+            (
+                -1
+                if min(pos, len(subject)) > endpos or p.match(subject, pos, endpos) is None
+                else p.match(subject, pos, endpos).end()
+            )
+            for pos in positions
+        ]
+        ends = p.match_at(subject, positions, endpos)
+        assert ends.typecode == "q" and ends.tolist() == expected
+    assert p.match_at(subject, array("q", sorted(positions))).tolist() == [
+        end for _, end in sorted(zip(positions, p.match_at(subject, positions)))
+    ]
+
+
+def test_pattern_match_at_clamped():
+    # Positions past the subject are clamped to its length, as by `match`
+    p = pcre2.compile(r"")
+    assert p.match("abc", 10).span() == (3, 3)
+    assert p.match_at("abc", [10, -5]).tolist() == [3, 0]
+    assert p.match_at("abc", [10, 3, 2], endpos=2).tolist() == [-1, -1, 2]
+
+
+test_data_pattern_match_many = [
+    (r"(?i)[a-zé]+\d", ["ab1", "x", "é a2", "😀B3", "1a2", "", "Éé9"], 0),
+    (r"\w+", ["ab", "é", "•", "😀", "a•"], pcre2.A),
+    (rb"ab|c", [b"ab", bytearray(b"abc"), memoryview(b"xc"), b""], 0),
+]
+
+
+@pytest.mark.parametrize("pattern,subjects,flags", test_data_pattern_match_many)
+@pytest.mark.parametrize("threads", [1, 3])
+@pytest.mark.parametrize("callout", [None, lambda callout_block: 0])
+def test_pattern_match_many(pattern, subjects, flags, threads, callout):
+    p = pcre2.compile(pattern, flags=flags, callout=callout)
+    for method in ("search", "match", "fullmatch"):
+        expected = [getattr(p, method)(subject) is not None for subject in subjects]
+        mask = getattr(p, method + "_many")(iter(subjects), threads=threads)
+        assert mask.typecode == "B" and mask.tolist() == expected
+        indices = getattr(p, method + "_many")(subjects, indices=True, threads=threads)
+        assert indices.tolist() == [idx for idx, value in enumerate(expected) if value]
+
+
+def test_pattern_match_many_errors():
+    p = pcre2.compile(r"a")
+    assert p.search_many([]).tolist() == []
+    for threads in (2, 4):
+        assert p.search_many([], threads=threads).tolist() == []
+        assert p.match_many([], indices=True, threads=threads).tolist() == []
+        assert p.fullmatch_many(["a", "b", "a"], threads=threads).tolist() == [1, 0, 1]
+    with pytest.raises(TypeError):
+        p.search_many(["a", b"a"])
+    with pytest.raises(ValueError):
+        p.search_many(["a"], threads=0)
+
+
+test_data_pattern_substitute_count = [
+    ("a", "-", "aaaa", 2, ("--aa", 2)),
+    ("a•", "-", "a•a•ba•", 2, ("--ba•", 2)),
+    ("x*", "-", "abc", 2, ("-a-bc", 2)),
+    ("z", "-", "abc", 1, ("abc", 0)),
+    (b"a", b"-", b"aaaa", 3, (b"---a", 3)),
+]
+
+
+@pytest.mark.parametrize(
+    "pattern,replacement,subject,count,result", test_data_pattern_substitute_count
+)
+def test_pattern_substitute_count(pattern, replacement, subject, count, result):
+    p = pcre2.compile(pattern)
+    assert p.subn(replacement, subject, count) == result
+
+
+def test_pattern_unpickle_source_only():
+    # Patterns pickled by earlier versions only carry their source
+    p = pcre2.Pattern.__new__(pcre2.Pattern)
+    p.__setstate__({"pattern": r"(?<a>\w+)", "flags": pcre2.A, "jit": True, "callout": None})
+    assert (p.groups, dict(p.groupindex), p.jit) == (1, {"a": 1}, True)
+    assert p.search("é abc")[0] == "abc"
+
+
+def test_pattern_finditer_file(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"ok id=1\nerror id=22\nok id=333\nerror id=4444\n")
+    p = pcre2.compile(rb"^error id=(\d+)$", flags=pcre2.M)
+    matches = list(p.finditer_file(path))
+    assert [m.span(1) for m in matches] == [(17, 19), (39, 43)]
+    assert [m[1] for m in matches] == [b"22", b"4444"]
+    assert p.count_file(path) == pcre2.compile(rb"error").count_file(str(path)) == 2
+
+    path.write_bytes(b"")
+    assert list(p.finditer_file(path)) == [] and p.count_file(path) == 0
+    with pytest.raises(TypeError):
+        pcre2.compile(r"error").count_file(path)
+
+
+test_data_pattern_byte_offsets = [
+    (r"(\w)(\w*)", "café naïve ÉTÉ"),
+    (r"(?<=•)(\w+)|(😀)", "a•bc••😀d•e"),
+    (r"\w*", "é•éé••ééé"),
+    (r"(b)|(c)", "plain ascii abc"),
+]
+
+
+@pytest.mark.parametrize("pattern,subject", test_data_pattern_byte_offsets)
+def test_pattern_byte_offsets(pattern, subject):
+    p = pcre2.compile(pattern, offsets="bytes")
+    r = pcre2.compile(pattern)
+
+    def encode(s):
+        return s.encode() if isinstance(s, str) else s
+
+    def byte_offset(pos):
+        return pos if pos < 0 else len(subject[:pos].encode())
+
+    # Spans are byte offsets into the encoding, and substrings are its bytes
+    matches = list(p.finditer(subject))
+    expected = list(r.finditer(subject))
+    assert len(matches) == len(expected) == p.count(subject)
+    for m, e in zip(matches, expected):
+        assert m.string is subject
+        for group in range(p.groups + 1):
+            assert m.span(group) == tuple(map(byte_offset, e.span(group)))
+            assert m[group] == encode(e[group])
+    m = p.search(subject, byte_offset(1))
+    assert m.span() == tuple(map(byte_offset, r.search(subject, 1).span()))
+    assert p.findall(subject) == [
+        tuple(map(encode, f)) if isinstance(f, tuple) else encode(f) for f in r.findall(subject)
+    ]
+    assert p.split(subject) == list(map(encode, r.split(subject)))
+    positions = list(range(len(subject)))
+    assert p.match_at(subject, list(map(byte_offset, positions))).tolist() == [
+        byte_offset(end) for end in r.match_at(subject, positions)
+    ]
+
+    # Substitutions and expansions are made into the original object
+    assert p.sub(r"<$0>", subject) == r.sub(r"<$0>", subject)
+    assert p.sub(lambda m: m[0][::-1], subject) == r.sub(lambda m: m[0][::-1], subject)
+    if matches:
+        assert matches[0].expand(r"[$0]") == expected[0].expand(r"[$0]")
+
+
+def test_pattern_byte_offsets_compile():
+    p = pcre2.compile(r"(\w+)", offsets="bytes")
+    assert pcre2.compile(p) is p
+    q = pcre2.compile(p, offsets="chars")
+    assert q.offsets == "chars" and q.search("é")[0] == "é"
+    assert pcre2.compile(p, jit=False).offsets == "bytes"
+    import pickle
+
+    assert pickle.loads(pickle.dumps(p)).search("é")[0] == "é".encode()
+    with pytest.raises(ValueError):
+        pcre2.compile(r"\w+", offsets="code units")
+
+
+def test_pattern_utf_bytes_scan():
+    # Bytes subjects are checked as UTF-8 by the first match of a scan only
+    p = pcre2.compile(rb"(?<=\s)(\w)(\w*)", flags=pcre2.U)
+    r = pcre2.compile(r"(?<=\s)(\w)(\w*)")
+    string = "naïve café ✓ Ωμέγα " * 50
+    subject = string.encode()
+    assert [m[0].decode() for m in p.finditer(subject)] == [m[0] for m in r.finditer(string)]
+    assert p.findall(subject) == [tuple(g.encode() for g in f) for f in r.findall(string)]
+    assert p.count(subject) == r.count(string)
+    assert b"".join(p.split(subject)).decode() == "".join(r.split(string))
+    assert p.sub(rb"$2$1", subject, 10).decode() == r.sub(r"$2$1", string, 10)
+    assert p.match_at(subject, [17, 1, 7]).tolist() == [27, -1, 12]
+
+    # Invalid subjects and templates are still reported
+    for method in (p.findall, p.split, p.count, lambda s: list(p.finditer(s))):
+        with pytest.raises(LibraryError):
+            method(b"a b\xff")
+    with pytest.raises(LibraryError):
+        p.match_at(b" ab\xff", [1, 0])
+    with pytest.raises(LibraryError):
+        p.search(subject).expand(b"$1\xff")
+
+
+def test_pattern_utf_mutable_scan():
+    # Mutable subjects are checked by every match, as they may change during the scan
+    p = pcre2.compile(rb".", flags=pcre2.U)
+    subject = bytearray("aé".encode() * 4)
+    matches = p.finditer(subject)
+    assert next(matches).span() == (0, 1)
+    subject[3:5] = b"\xff\x80"
+    with pytest.raises(LibraryError):
+        list(matches)
@@ -0,0 +1,102 @@
+import pytest
+import pcre2
+
+
+test_data_subject = [
+    (r"(\w)(\w*)", "café naïve ÉTÉ 😀 ok" * 40, 0),
+    (r"(\w+)", "plain ascii subject", 0),
+    (rb"(\w)\w", "ééé a".encode() * 10, pcre2.U),
+    (rb"(a)|b", bytearray(b"ab ba"), 0),
+]
+
+
+@pytest.mark.parametrize("pattern,string,flags", test_data_subject)
+@pytest.mark.parametrize("callout", [None, lambda callout_block: 0])
+def test_subject(pattern, string, flags, callout):
+    p = pcre2.compile(pattern, flags=flags, callout=callout)
+    subject = pcre2.Subject(string)
+    assert len(subject) == len(string) and subject.string is string
+    for pos, endpos in [(0, len(string)), (4, 300), (300, 301)]:
+        matches = list(p.finditer(subject, pos, endpos))
+        expected = list(p.finditer(string, pos, endpos))
+        assert [m.span() for m in matches] == [m.span() for m in expected]
+        assert [m.groups() for m in matches] == [m.groups() for m in expected]
+        assert all(m.string is string for m in matches)
+        assert p.count(subject, pos, endpos) == len(expected)
+        assert p.findall(subject, pos, endpos) == p.findall(string, pos, endpos)
+        m = p.search(subject, pos, endpos)
+        assert (m and m.span()) == (expected[0].span() if expected else None)
+    positions = list(range(0, len(string), 2))[::-1]
+    assert p.match_at(subject, positions) == p.match_at(string, positions)
+    assert p.split(subject) == p.split(string)
+    assert p.sub(lambda m: m[0][::-1], subject, 3) == p.sub(lambda m: m[0][::-1], string, 3)
+
+
+def test_subject_status():
+    assert repr(pcre2.Subject("abc")) == "<pcre2.Subject object; length=3>"
+    assert pcre2.Subject.__module__ == "pcre2"
+    assert pcre2.Subject("abc").is_ascii and pcre2.Subject("abc").is_utf8
+    assert not pcre2.Subject("é").is_ascii and pcre2.Subject("é").is_utf8
+    assert pcre2.Subject(b"abc").is_ascii
+    assert not pcre2.Subject("é".encode()).is_ascii and pcre2.Subject("é".encode()).is_utf8
+    assert not pcre2.Subject(b"\xc3").is_utf8
+    assert not pcre2.Subject("\ud800".encode("utf-8", "surrogatepass")).is_utf8
+
+
+def test_subject_utf_errors():
+    # Invalid subjects and offsets into characters are still reported once validated
+    p = pcre2.compile(rb".", flags=pcre2.U)
+    with pytest.raises(pcre2.LibraryError):
+        p.search(pcre2.Subject(b"a\xffb"))
+    subject = pcre2.Subject("aé".encode())
+    assert p.search(subject, 1)[0] == "é".encode()
+    with pytest.raises(pcre2.LibraryError):
+        p.search(subject, 2)
+    with pytest.raises(pcre2.LibraryError):
+        p.search(subject, 1, 2)
+
+
+def test_subject_byte_offsets():
+    string = "naïve café 😀"
+    subject = pcre2.Subject(string, offsets="bytes")
+    assert len(subject) == len(string.encode()) and subject.string is string
+    assert subject.offsets == "bytes" and subject.is_utf8 and not subject.is_ascii
+
+    # Any 'str' pattern reports byte offsets for encoded subjects
+    p = pcre2.compile(r"(\w+)")
+    assert [m.span() for m in p.finditer(subject)] == [(0, 6), (7, 12)]
+    assert p.search(subject, 6)[1] == "café".encode()
+    assert p.sub("<$1>", subject) == "<naïve> <café> 😀"
+    assert p.search(subject).expand("[$1]") == "[naïve]"
+    assert p.search_many([subject]).tolist() == [1]
+    with pytest.raises(pcre2.LibraryError):
+        p.search(subject, 3)
+    with pytest.raises(TypeError):
+        pcre2.compile(rb"\w+").search(subject)
+    with pytest.raises(ValueError):
+        pcre2.Subject(string, offsets="code units")
+
+
+def test_subject_mutable():
+    # Mutable buffers may change between matches, so their status is never cached
+    p = pcre2.compile(rb".", flags=pcre2.U)
+    buffer = bytearray("aé".encode() * 4)
+    subject = pcre2.Subject(buffer)
+    assert p.count(subject) == 8 and subject.is_utf8 and not subject.is_ascii
+    buffer[1] = buffer[2] = 0xFF
+    assert not subject.is_utf8
+    with pytest.raises(pcre2.LibraryError):
+        list(p.finditer(subject))
+    buffer[:] = b"abcdefghijkl"
+    assert subject.is_ascii and p.count(subject) == 12
+
+
+def test_subject_reinit():
+    # Subjects initialized again drop the index built for the previous object
+    p = pcre2.compile(r"(é+)", callout=lambda callout_block: 0)
+    subject = pcre2.Subject("x" + "é" * 1000)
+    assert p.search(subject, 600).span() == (600, 1001)
+    subject.__init__("é" * 10 + "x")
+    assert p.search(subject, 5).span() == (5, 10) and len(subject) == 11
+    subject.__init__(b"abc")
+    assert subject.is_ascii and subject.string == b"abc"
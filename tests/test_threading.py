@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import pytest
+import pcre2
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Subjects are large enough for matching to run without the GIL
+test_data_threaded_match = [
+    (rb"agggtaaa|tttaccct", b"acgt" * 4096 + b"tttaccct" + b"acgt" * 4096),
+    (r"(?<a>•+)(\w+)", "abc " * 4096 + "••xyz"),
+]
+
+
+@pytest.mark.parametrize("pattern,subject", test_data_threaded_match, ids=["bytes", "str"])
+def test_threaded_match(pattern, subject):
+    p = pcre2.compile(pattern)
+
+    def work(i):
+        m = p.search(subject, pos=i)
+        return m.span(), m.groups(), len(list(p.finditer(subject))), p.sub(type(subject)(), subject)
+
+    expected = [work(i) for i in range(16)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(work, range(16))) == expected
+
+
+def test_threaded_callout():
+    # Callouts are run with the GIL held
+    calls = []
+
+    def callout(callout_block):
+        calls.append(callout_block.value)
+
+    p = pcre2.compile(r"a(?C1)b", callout=callout)
+    subject = "x" * 4096 + "ab"
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        spans = list(executor.map(lambda _: p.search(subject).span(), range(16)))
+    assert spans == [(4096, 4098)] * 16
+    assert calls == [1] * 16
+
+
+def _gil_enabled():
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+@pytest.mark.skipif(
+    _gil_enabled() or (os.cpu_count() or 1) < 4, reason="Requires a free-threaded interpreter"
+)
+def test_threaded_scaling():
+    # Short subjects are dominated by Python-level overhead, which only runs in parallel without
+    # the GIL. Work is shared between threads on a single pattern
+    p = pcre2.compile(r"(?<key>\w+)=(?<value>\d+)")
+    subjects = [f"key{i}={i} other{i}={2 * i}" for i in range(2000)]
+
+    def work(_):
+        for subject in subjects:
+            p.search(subject).groupdict()
+            list(p.finditer(subject))
+            p.sub("$2=$1", subject)
+
+    def timed(num_threads):
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(work, range(num_threads)))
+            return time.perf_counter() - start
+
+    # Total work grows with the number of threads, so ideal scaling keeps the time constant
+    timed(4)
+    single, multi = timed(1), timed(4)
+    assert multi < 2 * single